@@ -1,7 +1,10 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
 from account import models
 from account.api import serializers
+from main.config import config
 
 
 class AccountViewSet(viewsets.ModelViewSet):
@@ -9,6 +12,17 @@ class AccountViewSet(viewsets.ModelViewSet):
     serializer_class = serializers.AccountSerializer
     filterset_fields = ["discord_id"]
 
+    @action(detail=True, methods=["GET"])
+    def dragonstone_forecast(self, request, pk=None):
+        account = self.get_object()
+        return Response(
+            {
+                "threshold": config.DRAGONSTONE_POINTS_THRESHOLD,
+                "expiration_date": account.dragonstone_expiration_date,
+                "forecast": account.dragonstone_forecast(),
+            }
+        )
+
 
 class UserCreationSubmissionSerializer(viewsets.ModelViewSet):
     queryset = models.UserCreationSubmission.objects.all()
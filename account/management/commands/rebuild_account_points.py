@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from account.models import Account
+
+
+class Command(BaseCommand):
+    help = "Recalculate the stored achievement points of every account from the board standings."
+
+    def handle(self, *args, **options):
+        Account.objects.update_achievement_points()
+        self.stdout.write(
+            f"Recalculated achievement points for {Account.objects.count()} accounts."
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from account.models import Account
+
+
+class Command(BaseCommand):
+    help = "Recalculate the stored dragonstone expiration date of every account from its dragonstone points."
+
+    def handle(self, *args, **options):
+        Account.objects.update_dragonstone_expiration()
+        self.stdout.write(
+            f"Recalculated dragonstone expiration dates for {Account.objects.count()} accounts."
+        )
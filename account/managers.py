@@ -1,11 +1,39 @@
 from datetime import timedelta
 
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Case, When, Sum, IntegerField, Value, QuerySet, Q
+from django.db.models import (
+    Case,
+    DateTimeField,
+    DecimalField,
+    DurationField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    When,
+    Sum,
+    IntegerField,
+    Max,
+    OuterRef,
+    Value,
+    QuerySet,
+    Q,
+    Subquery,
+    Window,
+)
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
 
+from achievements.models import RecordSubmission
 from dragonstone.models import DragonstonePoints, PVMSplitPoints, GroupCAPoints
 from main.config import config
-from main.models import Board
+
+# (changed within, fetched every): how often an account's hiscores are fetched, by how recently its scores last changed
+HISCORES_TIERS = [
+    (timedelta(days=1), timedelta(hours=1)),
+    (timedelta(days=7), timedelta(hours=6)),
+    (timedelta(days=30), timedelta(days=1)),
+]
+HISCORES_DORMANT_INTERVAL = timedelta(days=7)
 
 
 class AccountQueryset(QuerySet):
@@ -14,81 +42,242 @@ class AccountQueryset(QuerySet):
         Return all active accounts queryset with each accounts total dragonstone points annotated
         :ignore: a list of DragonstoneBaseSubmission primary keys to ignore when annotating dragonstone points
         """
-        if not ignore:
-            ignore = []
-        dstone_pts_sum_by_type = (
-            DragonstonePoints.objects.accepted()
-            .expired(expired=False, delta=delta)
-            .filter(~Q(pk__in=ignore))
-            .values("account", "polymorphic_ctype")
+        return self.annotate(
+            annotated_dragonstone_pts=dragonstone_points_subquery(
+                ignore=ignore, delta=delta
+            )
+        ).order_by("-annotated_dragonstone_pts", "name")
+
+    def dragonstone_threshold_crossings(self, added=None, removed=None):
+        """
+        Return the accounts in this queryset which gained and lost the dragonstone rank because of a change of
+        counted points, computed with a single query.
+        :added: a list of DragonstonePoints primary keys which are now counted, but were not before
+        :removed: a list of DragonstonePoints primary keys which were counted before, but are not now
+        """
+        accounts = self.annotate(
+            current_pts=dragonstone_points_subquery(),
+            previous_pts=dragonstone_points_subquery(ignore=added, include=removed),
+        )
+        threshold = config.DRAGONSTONE_POINTS_THRESHOLD
+        gained, lost = [], []
+        for account in accounts:
+            if account.current_pts >= threshold > account.previous_pts:
+                gained.append(account)
+            elif account.previous_pts >= threshold > account.current_pts:
+                lost.append(account)
+        return gained, lost
+
+    def dragonstone_expiration_dates(self):
+        """
+        Return a dict mapping the primary key of each account in this queryset which has the dragonstone rank to the
+        date it will lose the rank with its current set of points.
+        A running total of each account's active points is summed from newest to oldest with a window function, the
+        rank is lost once the first point that brings the running total over the threshold expires. The running total
+        only grows, so that is the newest point over the threshold, which is picked per account in the database.
+        """
+        is_capped = capped_points_q()
+        running = {"partition_by": [F("account")], "order_by": F("date").desc()}
+        capped_pts = Case(When(is_capped, then=F("points")), default=0)
+        uncapped_pts = Case(When(~is_capped, then=F("points")), default=0)
+        over_threshold = (
+            DragonstonePoints.objects.active()
+            .filter(account__in=self.values("pk"))
+            .annotate(
+                running_pts=Least(
+                    Window(Sum(capped_pts), **running),
+                    Value(config.CAPPED_POINTS_MAX),
+                )
+                + Window(Sum(uncapped_pts), **running)
+            )
+            .filter(running_pts__gte=config.DRAGONSTONE_POINTS_THRESHOLD)
+        )
+        period = timedelta(days=config.DRAGONSTONE_EXPIRATION_PERIOD)
+        return dict(
+            DragonstonePoints.objects.filter(pk__in=over_threshold.values("pk"))
+            .values("account")
+            .annotate(
+                expires_at=ExpressionWrapper(
+                    Max("date") + Value(period), output_field=DateTimeField()
+                )
+            )
             .order_by()
-            .annotate(pts=Sum("points"))
-            .values("account", "pts", "polymorphic_ctype")
+            .values_list("account", "expires_at")
         )
 
-        dstone_pts = {}
-        capped_pts_ctypes = [
-            ContentType.objects.get_for_model(PVMSplitPoints).id,
-            ContentType.objects.get_for_model(GroupCAPoints).id,
-        ]
-        for obj in dstone_pts_sum_by_type:
-            if obj["account"] not in dstone_pts.keys():
-                dstone_pts[obj["account"]] = {
-                    "uncapped": 0,
-                    "capped": 0,
-                }
-            if obj["polymorphic_ctype"] in capped_pts_ctypes:
-                dstone_pts[obj["account"]]["capped"] += obj["pts"]
-                if dstone_pts[obj["account"]]["capped"] > config.CAPPED_POINTS_MAX:
-                    dstone_pts[obj["account"]]["capped"] = config.CAPPED_POINTS_MAX
-            else:
-                dstone_pts[obj["account"]]["uncapped"] += obj["pts"]
-
-        whens = [
-            When(id=account, then=sum([val for val in pts.values()]))
-            for account, pts in dstone_pts.items()
-        ]
-        return self.annotate(
-            annotated_dragonstone_pts=Case(
-                *whens, output_field=IntegerField(), default=Value(0)
+    def update_dragonstone_expiration(self, force=False):
+        """
+        Recalculate the stored date each account in this queryset will lose the dragonstone rank with its current set
+        of points (Account.dragonstone_expires_at), or None if it does not have the rank.
+        Accounts whose stored date has already passed are skipped unless forced, so the notify_dstone_loss command still
+        sees them.
+        """
+        accounts = self
+        if not force:
+            accounts = accounts.exclude(dragonstone_expires_at__lte=timezone.now())
+        expiration_dates = accounts.dragonstone_expiration_dates()
+        self.model.objects.bulk_update(
+            [
+                self.model(pk=pk, dragonstone_expires_at=expiration_dates.get(pk))
+                for pk in accounts.values_list("pk", flat=True)
+            ],
+            ["dragonstone_expires_at"],
+            batch_size=500,
+        )
+
+    def hiscores_due(self):
+        """
+        Return the active accounts in this queryset whose hiscores are due to be fetched, most overdue first. Accounts
+        whose scores changed recently are due more often (HISCORES_TIERS), and accounts never fetched before first.
+        Accounts without a recorded change yet are due as often as the most recently changed ones.
+        """
+        now = timezone.now()
+        interval = Case(
+            When(hiscores_changed_at__isnull=True, then=Value(HISCORES_TIERS[0][1])),
+            *[
+                When(hiscores_changed_at__gte=now - within, then=Value(every))
+                for within, every in HISCORES_TIERS
+            ],
+            default=Value(HISCORES_DORMANT_INTERVAL),
+            output_field=DurationField(),
+        )
+        return (
+            self.filter(is_active=True)
+            .annotate(
+                hiscores_due_at=ExpressionWrapper(
+                    F("hiscores_fetched_at") + interval, output_field=DateTimeField()
+                )
             )
-        ).order_by("-annotated_dragonstone_pts", "name")
+            .filter(Q(hiscores_fetched_at__isnull=True) | Q(hiscores_due_at__lte=now))
+            .order_by(F("hiscores_due_at").asc(nulls_first=True), "pk")
+        )
 
     def annotate_points(self):
         """
         Return all a queryset of all active accounts with each accounts total record points annotated
         """
-        points = [
-            config.FIRST_PLACE_PTS,
-            config.SECOND_PLACE_PTS,
-            config.THIRD_PLACE_PTS,
-            config.FOURTH_PLACE_PTS,
-            config.FIFTH_PLACE_PTS,
+        return (
+            self.filter(is_active=True)
+            .annotate(
+                points=Coalesce(
+                    F("achievement_points__points"),
+                    Value(0),
+                    output_field=DecimalField(),
+                )
+            )
+            .order_by("-points", "name")
+        )
+
+    def update_achievement_points(self):
+        """
+        Recalculate the stored achievement points (account.models.AccountPoints) of each account in this queryset.
+        """
+        points_model = self.model.achievement_points.related.related_model
+        points_model.objects.bulk_create(
+            [
+                points_model(account_id=pk, points=points)
+                for pk, points in self.annotate(
+                    calculated_points=points_subquery()
+                ).values_list("pk", "calculated_points")
+            ],
+            update_conflicts=True,
+            unique_fields=["account"],
+            update_fields=["points"],
+            batch_size=500,
+        )
+
+
+def capped_points_q():
+    """
+    Return a Q object matching the DragonstonePoints whose sum is capped (PVM splits and group CAs).
+    """
+    return Q(
+        polymorphic_ctype__in=[
+            ContentType.objects.get_for_model(PVMSplitPoints).id,
+            ContentType.objects.get_for_model(GroupCAPoints).id,
         ]
+    )
 
-        account_ids = self.values_list("pk", flat=True)
-        accounts = dict(
-            zip(account_ids, [0] * len(account_ids))
-        )  # initialize of dict where key=account_id and value=0 so we can begin summing their points
 
-        for board in Board.objects.filter(
-            is_active=True, content__has_pbs=True
-        ).prefetch_related("submissions"):
-            submissions = board.top_unique_submissions()[:5]
+def dragonstone_points_subquery(ignore=None, include=None, delta=timedelta(0)):
+    """
+    Return a subquery expression of the total dragonstone points of the account referenced by OuterRef("pk").
+    The sum of capped points (PVM splits and group CAs) is limited to config.CAPPED_POINTS_MAX.
+    :ignore: a list of DragonstonePoints primary keys to not count
+    :include: a list of DragonstonePoints primary keys to count even if they are not accepted
+    """
+    if not ignore:
+        ignore = []
+    if not include:
+        include = []
+    is_capped = capped_points_q()
+    points = (
+        DragonstonePoints.objects.filter(Q(accepted=True) | Q(pk__in=include))
+        .expired(expired=False, delta=delta)
+        .filter(~Q(pk__in=ignore), account=OuterRef("pk"))
+        .order_by()
+        .values("account")
+        .annotate(
+            pts=Least(
+                Coalesce(Sum("points", filter=is_capped), Value(0)),
+                Value(config.CAPPED_POINTS_MAX),
+            )
+            + Coalesce(Sum("points", filter=~is_capped), Value(0))
+        )
+        .values("pts")
+    )
+    return Coalesce(Subquery(points), Value(0), output_field=IntegerField())
 
-            # list of accounts who already received points from this board
-            has_earned_pts = []
 
-            for index, submission in enumerate(submissions):
+def points_subquery():
+    """
+    Return a subquery expression of the total record points of the account referenced by OuterRef("pk").
+    Accounts earn points for each top 5 placement in the precomputed board standings of active boards, multiplied by
+    the board's points multiplier. An account is only awarded points once per board, for its best placement.
+    """
+    accounts_model = RecordSubmission.accounts.through
+    place_points = Case(
+        *[
+            When(recordsubmission__standing__rank=rank, then=Value(pts))
+            for rank, pts in enumerate(
+                [
+                    config.FIRST_PLACE_PTS,
+                    config.SECOND_PLACE_PTS,
+                    config.THIRD_PLACE_PTS,
+                    config.FOURTH_PLACE_PTS,
+                    config.FIFTH_PLACE_PTS,
+                ],
+                start=1,
+            )
+        ],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
 
-                for account in submission.accounts.all():
-                    if account.pk not in has_earned_pts:
-                        accounts[account.pk] += points[index] * board.points_multiplier
-                        has_earned_pts.append(account.pk)
+    # the account has a better placement on the same board from another team
+    better_placement = accounts_model.objects.filter(
+        account=OuterRef("account"),
+        recordsubmission__board=OuterRef("recordsubmission__board"),
+        recordsubmission__standing__rank__lt=OuterRef(
+            "recordsubmission__standing__rank"
+        ),
+    )
 
-        whens = [When(pk=pk, then=pts) for pk, pts in accounts.items()]
-        return (
-            self.filter(is_active=True)
-            .annotate(points=Case(*whens, default=0, output_field=IntegerField()))
-            .order_by("-points")
+    points = (
+        accounts_model.objects.filter(
+            account=OuterRef("pk"),
+            recordsubmission__standing__rank__lte=5,
+            recordsubmission__board__is_active=True,
+            recordsubmission__board__content__has_pbs=True,
+        )
+        .filter(~Exists(better_placement))
+        .values("account")
+        .annotate(
+            points=Sum(
+                place_points * F("recordsubmission__board__points_multiplier"),
+                output_field=DecimalField(),
+            )
         )
+        .values("points")
+    )
+    return Coalesce(Subquery(points), Value(0), output_field=DecimalField())
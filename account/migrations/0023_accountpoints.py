@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0022_alter_account_discord_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AccountPoints",
+            fields=[
+                (
+                    "account",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="achievement_points",
+                        serialize=False,
+                        to="account.account",
+                    ),
+                ),
+                (
+                    "points",
+                    models.DecimalField(
+                        db_index=True, decimal_places=2, default=0, max_digits=9
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Account Points",
+                "verbose_name_plural": "Account Points",
+            },
+        ),
+    ]
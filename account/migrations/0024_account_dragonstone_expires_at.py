@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0023_accountpoints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="dragonstone_expires_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Date this account will lose the dragonstone rank with its current set of points.",
+                null=True,
+            ),
+        ),
+    ]
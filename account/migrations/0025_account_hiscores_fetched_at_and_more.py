@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0024_account_dragonstone_expires_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="hiscores_fetched_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="Date this account's hiscores were last fetched.",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="hiscores_changed_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="Date a score in this account's hiscores last changed.",
+                null=True,
+            ),
+        ),
+    ]
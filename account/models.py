@@ -1,18 +1,21 @@
-import json
+from bisect import bisect_left
 from datetime import timedelta
+from itertools import accumulate
 
-import requests
 from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.db import models
-from django.db.models import Max, Min
+from django.db.models import BooleanField, ExpressionWrapper, Max, Min
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 from account import ACCOUNT_RANK_CHOICES, managers
 from achievements import CA_DICT
 from achievements.models import CASubmission, ColLogSubmission, PetSubmission
 from main.config import config
-from um.functions import get_file_path
+from main.models import Board, WebhookMessage
+from um.functions import changed_fields, get_file_path, loaded_values
 
 
 class Account(models.Model):
@@ -30,12 +33,47 @@ class Account(models.Model):
     rank = models.PositiveIntegerField(
         choices=ACCOUNT_RANK_CHOICES, null=True, blank=True
     )
+    dragonstone_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="Date this account will lose the dragonstone rank with its current set of points.",
+    )
+    hiscores_fetched_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Date this account's hiscores were last fetched.",
+    )
+    hiscores_changed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Date a score in this account's hiscores last changed.",
+    )
 
     objects = managers.AccountQueryset.as_manager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = loaded_values(instance, ["is_active"])
+        return instance
+
     def __str__(self):
         return self.display_name
 
+    def save(self, *args, **kwargs):
+        super(Account, self).save(*args, **kwargs)
+        if changed_fields(self, ["is_active"]):
+            # whether this account's submissions count as active has changed, so the standings of their boards may too
+            for board in Board.objects.filter(
+                submissions__accounts=self, submissions__accepted=True
+            ).distinct():
+                board.update_standings()
+        self._loaded_values = loaded_values(self, ["is_active"])
+
     @property
     def display_name(self):
         return self.preferred_name or self.name
@@ -63,7 +101,12 @@ class Account(models.Model):
         """
         Return total amount of achievements points for this account.
         """
-        return self.__class__.objects.annotate_points().get(id=self.id).points
+        return (
+            AccountPoints.objects.filter(account=self.id)
+            .values_list("points", flat=True)
+            .first()
+            or 0
+        )
 
     def get_dragonstone_pts(self, ignore=None):
         """
@@ -77,18 +120,65 @@ class Account(models.Model):
             .annotated_dragonstone_pts
         )
 
+    @cached_property
     def dragonstone_expiration_date(self):
         """
-        Return date this account will lose the dragonstone rank with the current set of points they have.
+        Return date this account will lose the dragonstone rank with the current set of points they have, or None if
+        they do not have the rank.
         """
-        pts = 0
-        expiration_date = None
-        for dstone_pts in self.dragonstone_points.active().order_by("-date"):
-            pts += dstone_pts.points
-            if pts >= config.DRAGONSTONE_POINTS_THRESHOLD:
-                expiration_date = dstone_pts.date
-                break
-        return expiration_date + timedelta(days=config.DRAGONSTONE_EXPIRATION_PERIOD)
+        return (
+            self.__class__.objects.filter(pk=self.pk)
+            .dragonstone_expiration_dates()
+            .get(self.pk)
+        )
+
+    def dragonstone_forecast(self):
+        """
+        Return the projected dragonstone points of this account for each of the next DRAGONSTONE_EXPIRATION_PERIOD
+        days as its current points expire, as a list of {"date", "points"} dicts.
+        All active points are fetched in a single query, and each day's total is then read from suffix sums of the
+        points ordered by date, so no per-day queries are needed.
+        """
+        points = list(
+            self.dragonstone_points.active()
+            .annotate(
+                is_capped=ExpressionWrapper(
+                    managers.capped_points_q(), output_field=BooleanField()
+                )
+            )
+            .order_by("date")
+            .values_list("date", "points", "is_capped")
+        )
+        dates = [date for date, _, _ in points]
+        # suffix sums, capped_pts[i] is the sum of the capped points from the i-th oldest point onwards
+        capped_pts = list(
+            accumulate(
+                (pts if is_capped else 0 for _, pts, is_capped in reversed(points)),
+                initial=0,
+            )
+        )[::-1]
+        uncapped_pts = list(
+            accumulate(
+                (0 if is_capped else pts for _, pts, is_capped in reversed(points)),
+                initial=0,
+            )
+        )[::-1]
+
+        now = timezone.now()
+        period = timedelta(days=config.DRAGONSTONE_EXPIRATION_PERIOD)
+        forecast = []
+        for day in range(config.DRAGONSTONE_EXPIRATION_PERIOD + 1):
+            date = now + timedelta(days=day)
+            # points dated before date - period have expired by date
+            i = bisect_left(dates, date - period)
+            forecast.append(
+                {
+                    "date": date.date(),
+                    "points": min(capped_pts[i], config.CAPPED_POINTS_MAX)
+                    + uncapped_pts[i],
+                }
+            )
+        return forecast
 
     def create_update_dstone_status_embed(self):
         """
@@ -112,14 +202,33 @@ class Account(models.Model):
         Post updates to the #dragonstone-updates channel to notify changing of
         dragonstone rank for this account
         """
-        data = json.dumps({"embeds": [self.create_update_dstone_status_embed()]})
-        requests.post(
+        WebhookMessage.enqueue(
             settings.DRAGONSTONE_UPDATES_DISCORD_WEBHOOK_URL,
-            data=data,
-            headers={"Content-Type": "application/json"},
+            {"embeds": [self.create_update_dstone_status_embed()]},
         )
 
 
+class AccountPoints(models.Model):
+    """
+    Precomputed total achievement points of an account, see AccountQueryset.update_achievement_points().
+    Updated whenever the top 5 of a board's standings, a board's points multiplier or the place points change.
+    """
+
+    account = models.OneToOneField(
+        "account.Account",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="achievement_points",
+    )
+    points = models.DecimalField(
+        max_digits=9, decimal_places=2, default=0, db_index=True
+    )
+
+    class Meta:
+        verbose_name = "Account Points"
+        verbose_name_plural = "Account Points"
+
+
 class UserCreationSubmission(models.Model):
     """
     Used to moderate account creation.
@@ -155,18 +264,13 @@ class UserCreationSubmission(models.Model):
         """
         Post to discord um pb webhook the newly accepted submission!
         """
-        data = json.dumps(
+        WebhookMessage.enqueue(
+            config.UM_USER_CREATION_SUBMISSIONS_DISCORD_WEBHOOK_URL,
             {
                 "embeds": [self.create_new_submission_embed()],
                 "components": self.create_new_submission_components(),
-            }
+            },
         )
-        if config.UM_USER_CREATION_SUBMISSIONS_DISCORD_WEBHOOK_URL:
-            requests.post(
-                config.UM_USER_CREATION_SUBMISSIONS_DISCORD_WEBHOOK_URL,
-                data=data,
-                headers={"Content-Type": "application/json"},
-            )
 
     def create_new_submission_embed(self):
         """
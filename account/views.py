@@ -61,6 +61,15 @@ class ProfileView(TemplateView):
         except EmptyPage:
             context[active_pb_page] = data[context["active_tab"]].page(1)
 
+        if context["active_tab"] == "dragonstone":
+            # only show the days on which the projected points change
+            forecast = self.request.user.account.dragonstone_forecast()
+            context["dragonstone_forecast"] = [
+                day
+                for i, day in enumerate(forecast)
+                if i == 0 or day["points"] != forecast[i - 1]["points"]
+            ]
+
         context["config"] = config
 
         return context
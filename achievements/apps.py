@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AchievementsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "achievements"
+
+    def ready(self):
+        from achievements import signals
@@ -0,0 +1,10 @@
+import hashlib
+
+
+def get_team_key(account_ids):
+    """
+    Return a key uniquely identifying the team made up of the accounts with the given primary keys.
+    The key is a hash of the sorted account ids, so it does not depend on the order of the accounts or their names.
+    """
+    team = ",".join(str(account_id) for account_id in sorted(account_ids))
+    return hashlib.sha1(team.encode()).hexdigest()
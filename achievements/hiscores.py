@@ -0,0 +1,175 @@
+import asyncio
+import random
+import statistics
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+from django.conf import settings
+
+__all__ = ["HiscoresFetcher", "summarize"]
+
+
+class HiscoresFetcher:
+    """
+    Fetches the hiscores of many players from the OSRS hiscores api.
+
+    The number of requests in flight is limited with AIMD: the limit grows by one per round of successful requests,
+    and is halved whenever a request is rate limited, fails, times out or is slower than target_latency. Requests
+    which are rate limited, fail with a server error or time out are put back on the queue once their exponential
+    backoff has passed, up to max_retries times, so waiting out a backoff never takes up a worker.
+
+    The api url defaults to settings.OSRS_PLAYER_HISCORES_API, and can be pointed at a local stand-in server for
+    testing.
+    """
+
+    def __init__(
+        self,
+        api_url=None,
+        min_concurrency=1,
+        max_concurrency=20,
+        initial_concurrency=5,
+        timeout=10,
+        max_retries=4,
+        backoff=1,
+        target_latency=2,
+    ):
+        self.api_url = api_url or settings.OSRS_PLAYER_HISCORES_API
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = initial_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.target_latency = target_latency
+
+        self.in_flight = 0
+        self.decreased_at = 0
+        self.latencies = []
+        self.retries = 0
+        # "username (reason)" of each account which could not be fetched
+        self.failed = []
+
+    async def fetch_all(self, accounts, on_result):
+        """
+        Fetch the hiscores of each (pk, username) in accounts, and await on_result(pk, text) with the response body
+        of each, or None if it could not be fetched.
+        """
+        self.condition = asyncio.Condition()
+        # accounts whose result has not been passed to on_result yet, including those waiting out a backoff
+        self.remaining = 0
+        self.finished = asyncio.Event()
+        queue = asyncio.Queue()
+        for pk, username in accounts:
+            queue.put_nowait((pk, username, 0))
+            self.remaining += 1
+        if not self.remaining:
+            return
+
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        conn = aiohttp.TCPConnector(limit=self.max_concurrency)
+        async with aiohttp.ClientSession(connector=conn, timeout=timeout) as session:
+            workers = [
+                asyncio.create_task(self.worker(session, queue, on_result))
+                for _ in range(self.max_concurrency)
+            ]
+            # surface a worker's exception instead of waiting for the remaining accounts forever
+            finished = asyncio.create_task(self.finished.wait())
+            await asyncio.wait(
+                [finished, *workers], return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in [finished, *workers]:
+                task.cancel()
+            for worker in workers:
+                if worker.done() and not worker.cancelled() and worker.exception():
+                    raise worker.exception()
+
+    async def worker(self, session, queue, on_result):
+        loop = asyncio.get_running_loop()
+        while True:
+            pk, username, attempt = await queue.get()
+            async with self.slot():
+                status, text, retry_after = await self.request(session, username)
+
+            if status == 200:
+                await self.finish(on_result, pk, text)
+            elif (
+                status is None or status == 429 or status >= 500
+            ) and attempt < self.max_retries:
+                self.retries += 1
+                delay = retry_after or self.backoff * 2**attempt
+                delay += random.uniform(0, self.backoff)
+                # only put back on the queue once it is ready, so no worker waits on it
+                loop.call_later(delay, queue.put_nowait, (pk, username, attempt + 1))
+            else:
+                self.failed.append(f"{username} ({status or 'no response'})")
+                await self.finish(on_result, pk, None)
+
+    async def finish(self, on_result, pk, text):
+        await on_result(pk, text)
+        self.remaining -= 1
+        if not self.remaining:
+            self.finished.set()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
+
+    async def request(self, session, username):
+        """
+        Return the status (None if the request failed), body and Retry-After seconds of a hiscores request.
+        """
+        status, text, retry_after = None, None, None
+        start = time.perf_counter()
+        try:
+            async with session.get(f"{self.api_url}{username}") as response:
+                status = response.status
+                if status == 200:
+                    text = await response.text()
+                elif "Retry-After" in response.headers:
+                    retry_after = float(response.headers["Retry-After"])
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        latency = time.perf_counter() - start
+        self.latencies.append(latency)
+
+        congested = (
+            status is None
+            or status == 429
+            or status >= 500
+            or latency > self.target_latency
+        )
+        if congested:
+            # halve at most once per target latency, so one burst of failures doesn't collapse the limit
+            if time.monotonic() - self.decreased_at > self.target_latency:
+                self.limit = max(self.limit / 2, self.min_concurrency)
+                self.decreased_at = time.monotonic()
+        else:
+            self.limit = min(self.limit + 1 / self.limit, self.max_concurrency)
+        return status, text, retry_after
+
+    def summary(self):
+        return summarize(self.latencies, self.retries, len(self.failed), self.limit)
+
+
+def summarize(latencies, retries, failed, concurrency):
+    """
+    Summary of a fetch, for HiscoresFetcher.summary and the merged summary of several fetchers.
+    """
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=20)
+        latency = f"latency p50 {quantiles[9]:.2f}s, p95 {quantiles[18]:.2f}s"
+    else:
+        latency = "latency n/a"
+    return (
+        f"{len(latencies)} requests, {retries} retries, {failed} failed, "
+        f"final concurrency {int(concurrency)}, {latency}"
+    )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from achievements.models import RecordSubmission
+
+
+class Command(BaseCommand):
+    help = "Recalculate the team key of every record submission from its accounts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        pks = list(RecordSubmission.objects.order_by("pk").values_list("pk", flat=True))
+        total = 0
+        for i in range(0, len(pks), options["batch_size"]):
+            batch = pks[i : i + options["batch_size"]]
+            total += RecordSubmission.objects.filter(pk__in=batch).update_team_keys()
+        self.stdout.write(f"Updated team keys for {total} record submissions.")
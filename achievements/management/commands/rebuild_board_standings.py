@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Board
+
+
+class Command(BaseCommand):
+    help = "Rebuild the precomputed leaderboard standings of every board from scratch."
+
+    def handle(self, *args, **options):
+        boards = Board.objects.select_related("content")
+        for board in boards:
+            board.update_standings()
+        self.stdout.write(f"Rebuilt standings for {boards.count()} boards.")
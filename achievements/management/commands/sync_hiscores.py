@@ -1,73 +1,421 @@
 import asyncio
 import json
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
-import aiohttp
-from django.conf import settings
-from django.core.management.base import BaseCommand
+import django
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+from django.db.models.functions import Mod
+from django.utils import timezone
 
 from account.models import Account
-from achievements.models import Hiscores
+from achievements.hiscores import HiscoresFetcher, summarize
+from achievements.models import Hiscores, HiscoresHistory, HiscoresSync
 from main.models import Content
 
+CHECKPOINT_INTERVAL = 100  # in accounts
+# options passed on to the processes syncing each shard
+SHARD_OPTIONS = [
+    "batch_size",
+    "concurrency",
+    "timeout",
+    "max_retries",
+    "api_url",
+    "queue_size",
+    "resume",
+    "budget",
+]
 
-def get_url(username):
-    return f"{settings.OSRS_PLAYER_HISCORES_API}{username}"
 
-
-async def get(session, username):
-    url = get_url(username)
-    async with session.get(url) as response:
-        if response.status != 200:
-            print(username, response.status)
-            return username, None
-        return username, await response.text()
-
-
-async def main(usernames):
-    conn = aiohttp.TCPConnector(limit=10)
-    async with aiohttp.ClientSession(connector=conn) as session:
-        return await asyncio.gather(*[get(session, username) for username in usernames])
+def sync_shard(shard, workers, options):
+    """
+    Sync the accounts whose primary key is shard modulo workers, in a worker process of sync_hiscores --workers.
+    """
+    return Command().sync_hiscores(options, shard, workers)
 
 
 class Command(BaseCommand):
     help = "Syncs active users hiscores for all content using the official OSRS api."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of hiscores written per query.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Maximum number of accounts fetched in parallel, the actual number adapts to the api's latency and errors.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=10,
+            help="Timeout of each hiscores request, in seconds.",
+        )
+        parser.add_argument(
+            "--max-retries",
+            type=int,
+            default=4,
+            help="Number of times an account is retried after a rate limit, server error or timeout.",
+        )
+        parser.add_argument(
+            "--api-url",
+            help="Hiscores api url the username is appended to, defaults to settings.OSRS_PLAYER_HISCORES_API.",
+        )
+        parser.add_argument(
+            "--queue-size",
+            type=int,
+            default=50,
+            help="Number of fetched accounts that may wait to be written before fetching pauses.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Resume the last unfinished sync from its checkpoint instead of starting a new one.",
+        )
+        parser.add_argument(
+            "--budget",
+            type=int,
+            help="Only sync this many accounts, those most overdue by how recently their scores changed.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep running, syncing every this many seconds.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes to sync with, each syncing a shard of the accounts partitioned by primary key.",
+        )
+
     def handle(self, *args, **options):
-        results = asyncio.run(
-            main(
-                list(
-                    Account.objects.filter(is_active=True).values_list(
-                        "name", flat=True
-                    )
-                ),
+        if options["resume"] and (options["budget"] or options["interval"]):
+            raise CommandError(
+                "--resume can't be combined with --budget or --interval."
+            )
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+        if options["interval"] is None:
+            self.write_summary(self.sync_all(options))
+            return
+        while True:
+            start = time.monotonic()
+            close_old_connections()
+            self.write_summary(self.sync_all(options))
+            time.sleep(max(options["interval"] - (time.monotonic() - start), 0))
+
+    def sync_all(self, options):
+        """
+        Sync all accounts, in options["workers"] processes each syncing its own shard of the accounts with its own
+        database connection, and return the merged results.
+        """
+        workers = options["workers"]
+        if workers == 1:
+            return self.sync_hiscores(options)
+
+        if (
+            options["resume"]
+            and not HiscoresSync.objects.filter(
+                finished_at__isnull=True, workers=workers
+            ).exists()
+        ):
+            raise CommandError(
+                f"There is no unfinished sync with {workers} workers to resume."
+            )
+        shard_options = {key: options[key] for key in SHARD_OPTIONS}
+        # the concurrency limit is for all workers together, to not put more load on the api
+        shard_options["concurrency"] = max(options["concurrency"] // workers, 1)
+
+        start = time.perf_counter()
+        # spawned rather than forked, so no worker shares the database connection or event loop of this process
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        ) as executor:
+            results = list(
+                executor.map(
+                    sync_shard,
+                    range(workers),
+                    [workers] * workers,
+                    [shard_options] * workers,
+                )
+            )
+
+        merged = {
+            key: sum(result[key] for result in results)
+            for key in [
+                "accounts_synced",
+                "hiscores_written",
+                "hiscores_skipped",
+                "fetch_time",
+                "parse_time",
+                "write_time",
+                "retries",
+                "concurrency",
+            ]
+        }
+        merged["latencies"] = [
+            latency for result in results for latency in result["latencies"]
+        ]
+        merged["failed"] = [
+            username for result in results for username in result["failed"]
+        ]
+        merged["total_time"] = time.perf_counter() - start
+        return merged
+
+    def sync_hiscores(self, options, shard=None, workers=None):
+        """
+        Sync all accounts, or only those in shard of workers shards, and return the results.
+        """
+        if options["resume"]:
+            self.sync = HiscoresSync.objects.filter(
+                finished_at__isnull=True, shard=shard, workers=workers
+            ).first()
+            if self.sync is None:
+                if shard is not None:
+                    # this shard already finished
+                    return {
+                        "accounts_synced": 0,
+                        "hiscores_written": 0,
+                        "hiscores_skipped": 0,
+                        "total_time": 0,
+                        "fetch_time": 0,
+                        "parse_time": 0,
+                        "write_time": 0,
+                        "latencies": [],
+                        "retries": 0,
+                        "failed": [],
+                        "concurrency": 0,
+                    }
+                raise CommandError("There is no unfinished sync to resume.")
+        else:
+            self.sync = HiscoresSync.objects.create(shard=shard, workers=workers)
+
+        accounts = Account.objects.filter(is_active=True)
+        if options["budget"] is not None:
+            accounts = accounts.filter(
+                pk__in=Account.objects.hiscores_due().values("pk")[: options["budget"]]
+            )
+        if shard is not None:
+            accounts = accounts.alias(hiscores_shard=Mod("pk", workers)).filter(
+                hiscores_shard=shard
             )
+        accounts = accounts.order_by("pk")
+        if self.sync.checkpoint is not None:
+            accounts = accounts.filter(pk__gt=self.sync.checkpoint)
+        # case-folded name -> id map, so parsing the results needs no queries
+        self.contents = {
+            name.casefold(): pk
+            for pk, name in Content.objects.exclude(hiscores_name="").values_list(
+                "pk", "hiscores_name"
+            )
+        }
+        self.skipped = 0
+        self.batch_size = options["batch_size"]
+        self.parse_time = 0
+        self.write_time = 0
+
+        fetcher = HiscoresFetcher(
+            api_url=options["api_url"],
+            max_concurrency=options["concurrency"],
+            timeout=options["timeout"],
+            max_retries=options["max_retries"],
+        )
+
+        start = time.perf_counter()
+        fetch_time = asyncio.run(
+            self.run(
+                fetcher, list(accounts.values_list("pk", "name")), options["queue_size"]
+            )
+        )
+        total_time = time.perf_counter() - start
+
+        self.sync.finished_at = timezone.now()
+        self.sync.save(update_fields=["finished_at"])
+        return {
+            "accounts_synced": self.sync.accounts_synced,
+            "hiscores_written": self.sync.hiscores_written,
+            "hiscores_skipped": self.sync.hiscores_skipped,
+            "total_time": total_time,
+            "fetch_time": fetch_time,
+            "parse_time": self.parse_time,
+            "write_time": self.write_time,
+            "latencies": fetcher.latencies,
+            "retries": fetcher.retries,
+            "failed": fetcher.failed,
+            "concurrency": fetcher.limit,
+        }
+
+    def write_summary(self, results):
+        # with several workers the phase times are summed over all of them
+        self.stdout.write(
+            f"Synced {results['accounts_synced']} accounts, wrote {results['hiscores_written']} changed hiscores and "
+            f"skipped {results['hiscores_skipped']} unchanged hiscores in "
+            f"{results['total_time']:.2f}s (fetch {results['fetch_time']:.2f}s, "
+            f"parse {results['parse_time']:.2f}s, write {results['write_time']:.2f}s)."
+        )
+        summary = summarize(
+            results["latencies"],
+            results["retries"],
+            len(results["failed"]),
+            results["concurrency"],
+        )
+        self.stdout.write(f"Fetched with {summary}.")
+        if results["failed"]:
+            self.stdout.write(f"Failed to fetch: {', '.join(results['failed'])}")
+
+    async def run(self, fetcher, accounts, queue_size):
+        """
+        Fetch the hiscores of accounts with fetcher, streaming the results through a bounded queue to a writer which
+        upserts them in batches as they arrive.
+        Return the time spent fetching.
+        """
+        results = asyncio.Queue(maxsize=queue_size)
+
+        async def on_result(pk, result):
+            await results.put((pk, result))
+
+        async def produce():
+            start = time.perf_counter()
+            await fetcher.fetch_all(accounts, on_result)
+            await results.put(None)
+            return time.perf_counter() - start
+
+        # if the writer fails the whole run stops, rather than the fetchers waiting on a full queue forever
+        fetch_time, _ = await asyncio.gather(
+            produce(), self.write_results(results, [pk for pk, _ in accounts])
         )
+        return fetch_time
+
+    async def write_results(self, results, order):
+        """
+        Take fetched results from the queue and write them in batches of CHECKPOINT_INTERVAL accounts, advancing the
+        checkpoint past every account whose hiscores, and those of all accounts before it, have been written.
+        """
+        batch = []
+        done = set()  # synced accounts the checkpoint has not passed yet
+        position = 0
+        checkpoint = self.sync.checkpoint
+
+        def advance_checkpoint():
+            nonlocal position, checkpoint
+            while position < len(order) and order[position] in done:
+                done.remove(order[position])
+                checkpoint = order[position]
+                position += 1
+
+        while (item := await results.get()) is not None:
+            batch.append(item)
+            done.add(item[0])
+            if len(batch) >= CHECKPOINT_INTERVAL:
+                advance_checkpoint()
+                await sync_to_async(self.write)(batch, checkpoint)
+                batch = []
 
-        objs = []
-        for username, result in results:
-            if not result:
+        advance_checkpoint()
+        await sync_to_async(self.write)(batch, checkpoint)
+
+    def parse(self, account_id, result, current_scores, objs, history):
+        """
+        Append the hiscores in result which changed from current_scores, a dict of the account's current
+        (score, rank_overall) by content id, to objs, and the change of each previously synced score to history.
+        Return whether any score changed. The first scores synced for an account count as a change, so it starts in
+        the most frequent tier of the scheduler (see AccountQueryset.hiscores_due) and moves down if it stays the same.
+        """
+        if not result:
+            return False
+        history_count = len(history)
+        objs_count = len(objs)
+        recorded_at = timezone.now()
+        for hiscore in json.loads(result)["activities"]:
+            content_id = self.contents.get(hiscore["name"].casefold())
+            if content_id is None:
+                continue
+            current = current_scores.get(content_id)
+            if current == (hiscore["score"], hiscore["rank"]):
+                self.skipped += 1
                 continue
-            result = json.loads(result)
-            for hiscore in result["activities"]:
-                try:
-                    content = Content.objects.get(hiscores_name__iexact=hiscore["name"])
-                except Content.DoesNotExist:
-                    continue
-
-                account = Account.objects.get(name=username)
-
-                objs.append(
-                    Hiscores(
-                        account=account,
-                        content=content,
-                        score=hiscore["score"],
-                        rank_overall=hiscore["rank"],
+            # unranked scores are -1
+            if current is not None and (
+                delta := max(hiscore["score"], 0) - max(current[0], 0)
+            ):
+                history.append(
+                    HiscoresHistory(
+                        account_id=account_id,
+                        content_id=content_id,
+                        delta=delta,
+                        recorded_at=recorded_at,
                     )
                 )
+            objs.append(
+                Hiscores(
+                    account_id=account_id,
+                    content_id=content_id,
+                    score=hiscore["score"],
+                    rank_overall=hiscore["rank"],
+                )
+            )
+        if not current_scores:
+            return len(objs) > objs_count
+        return len(history) > history_count
 
-        Hiscores.objects.bulk_create(
-            objs,
-            update_conflicts=True,
-            unique_fields=["account", "content"],
-            update_fields=["score", "rank_overall"],
-        )
+    def write(self, batch, checkpoint):
+        """
+        Parse and write the fetched (account id, result) of batch. Only hiscores which changed since the last sync are
+        written, with their history, so the current scores of the batch's accounts are loaded first.
+        """
+        start = time.perf_counter()
+        fetched = [account_id for account_id, _ in batch]
+        current = defaultdict(dict)
+        for account_id, content_id, score, rank_overall in Hiscores.objects.filter(
+            account__in=fetched
+        ).values_list("account", "content", "score", "rank_overall"):
+            current[account_id][content_id] = (score, rank_overall)
+        self.write_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        objs, history, changed = [], [], []
+        for account_id, result in batch:
+            if self.parse(account_id, result, current[account_id], objs, history):
+                changed.append(account_id)
+        self.parse_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        now = timezone.now()
+        with transaction.atomic():
+            Hiscores.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=["account", "content"],
+                update_fields=["score", "rank_overall"],
+                batch_size=self.batch_size,
+            )
+            HiscoresHistory.objects.bulk_create(history, batch_size=self.batch_size)
+            # accounts which failed to fetch count as fetched too, so they can't use up the budget of every run
+            Account.objects.filter(pk__in=fetched).update(hiscores_fetched_at=now)
+            Account.objects.filter(pk__in=changed).update(hiscores_changed_at=now)
+            self.sync.checkpoint = checkpoint
+            self.sync.accounts_synced += len(fetched)
+            self.sync.hiscores_written += len(objs)
+            self.sync.hiscores_skipped += self.skipped
+            self.sync.save(
+                update_fields=[
+                    "checkpoint",
+                    "accounts_synced",
+                    "hiscores_written",
+                    "hiscores_skipped",
+                ]
+            )
+        self.skipped = 0
+        self.write_time += time.perf_counter() - start
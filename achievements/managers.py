@@ -1,6 +1,10 @@
-from django.db.models import Count, F, Q
+from collections import defaultdict
+
+from django.db.models import Count, F, Q, QuerySet, Sum
 from polymorphic.managers import PolymorphicQuerySet
 
+from achievements.functions import get_team_key
+
 
 class SubmissionQueryset(PolymorphicQuerySet):
     def accepted(self):
@@ -14,3 +18,54 @@ class SubmissionQueryset(PolymorphicQuerySet):
             num_accounts=Count("accounts"),
             num_active_accounts=Count("accounts", filter=Q(accounts__is_active=True)),
         ).filter(num_active_accounts__gte=F("num_accounts") / float(2))
+
+    def update_team_keys(self):
+        """
+        Recalculate the team_key of each RecordSubmission in this queryset from its accounts.
+        """
+        accounts = defaultdict(list)
+        for submission_id, account_id in self.model.accounts.through.objects.filter(
+            recordsubmission__in=self.values("pk")
+        ).values_list("recordsubmission", "account"):
+            accounts[submission_id].append(account_id)
+
+        submissions = [
+            self.model(pk=pk, team_key=get_team_key(accounts[pk]))
+            for pk in self.values_list("pk", flat=True)
+        ]
+        self.model.objects.bulk_update(submissions, ["team_key"], batch_size=500)
+        return len(submissions)
+
+
+class HiscoresHistoryQueryset(QuerySet):
+    def period(self, since, until=None):
+        qs = self.filter(recorded_at__gte=since)
+        if until is not None:
+            qs = qs.filter(recorded_at__lt=until)
+        return qs
+
+    def top_gainers(self, content, since, until=None):
+        """
+        Accounts which gained score in content between since and until, ordered by their total gains, as dicts of
+        account, account__name, account__preferred_name and gained. Runs as a single grouped query.
+        """
+        return (
+            self.filter(content=content)
+            .period(since, until)
+            .values("account", "account__name", "account__preferred_name")
+            .annotate(gained=Sum("delta"))
+            .filter(gained__gt=0)
+            .order_by("-gained", "account__name")
+        )
+
+    def gains(self, since, until=None):
+        """
+        Total gains of each account in each content between since and until, as dicts of account, content and gained.
+        """
+        return (
+            self.period(since, until)
+            .values("account", "content")
+            .annotate(gained=Sum("delta"))
+            .filter(gained__gt=0)
+            .order_by("content", "-gained")
+        )
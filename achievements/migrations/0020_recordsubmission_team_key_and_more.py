@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("achievements", "0019_alter_hiscores_options_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recordsubmission",
+            name="team_key",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Hash of the sorted account ids of this submission, used to group submissions by team.",
+                max_length=40,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recordsubmission",
+            index=models.Index(
+                fields=["board", "team_key", "value"],
+                name="recordsub_board_team_value_idx",
+            ),
+        ),
+    ]
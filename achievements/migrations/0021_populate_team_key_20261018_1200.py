@@ -0,0 +1,36 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+from achievements.functions import get_team_key
+
+
+def forward(apps, schema_data):
+    record_submission_model = apps.get_model("achievements", "RecordSubmission")
+    accounts = defaultdict(list)
+    for (
+        submission_id,
+        account_id,
+    ) in record_submission_model.accounts.through.objects.values_list(
+        "recordsubmission", "account"
+    ):
+        accounts[submission_id].append(account_id)
+
+    submissions = []
+    for submission in record_submission_model.objects.only("pk"):
+        submission.team_key = get_team_key(accounts[submission.pk])
+        submissions.append(submission)
+    record_submission_model.objects.bulk_update(
+        submissions, ["team_key"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("achievements", "0020_recordsubmission_team_key_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0110_settingsversion"),
+        ("achievements", "0021_populate_team_key_20261018_1200"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BoardStanding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("team_key", models.CharField(max_length=40)),
+                ("rank", models.PositiveIntegerField()),
+                (
+                    "board",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="standings",
+                        to="main.board",
+                    ),
+                ),
+                (
+                    "submission",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="standing",
+                        to="achievements.recordsubmission",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Board Standing",
+                "verbose_name_plural": "Board Standings",
+                "ordering": ["board", "rank"],
+                "unique_together": {("board", "rank"), ("board", "team_key")},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0110_settingsversion"),
+        ("achievements", "0022_boardstanding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="boardstanding",
+            name="value",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=7),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="boardstanding",
+            index=models.Index(
+                fields=["board", "value"], name="standing_board_value_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("achievements", "0023_boardstanding_value_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HiscoresSync",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "checkpoint",
+                    models.PositiveBigIntegerField(blank=True, null=True),
+                ),
+                ("accounts_synced", models.PositiveIntegerField(default=0)),
+                ("hiscores_written", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Hiscores Sync",
+                "verbose_name_plural": "Hiscores Syncs",
+                "ordering": ["-started_at"],
+            },
+        ),
+    ]
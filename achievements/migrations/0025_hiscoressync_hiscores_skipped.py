@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("achievements", "0024_hiscoressync"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="hiscoressync",
+            name="hiscores_skipped",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Number of fetched hiscores which had not changed."
+            ),
+        ),
+    ]
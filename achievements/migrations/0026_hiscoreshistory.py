@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0024_account_dragonstone_expires_at"),
+        ("achievements", "0025_hiscoressync_hiscores_skipped"),
+        ("main", "0111_webhookmessage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HiscoresHistory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("delta", models.IntegerField()),
+                (
+                    "recorded_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hiscores_history",
+                        to="account.account",
+                    ),
+                ),
+                (
+                    "content",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="main.content",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Hiscores History",
+                "verbose_name_plural": "Hiscores History",
+                "ordering": ["-recorded_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["content", "recorded_at"],
+                        name="hiscores_history_content_date",
+                    )
+                ],
+            },
+        ),
+    ]
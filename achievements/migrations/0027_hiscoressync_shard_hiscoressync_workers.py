@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("achievements", "0026_hiscoreshistory"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="hiscoressync",
+            name="shard",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Shard of the accounts synced, when synced with several workers.",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="hiscoressync",
+            name="workers",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Number of workers the accounts were sharded between.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("achievements", "0027_hiscoressync_shard_hiscoressync_workers"),
+        ("main", "0111_webhookmessage"),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name="boardstanding",
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name="boardstanding",
+            constraint=models.UniqueConstraint(
+                deferrable=models.Deferrable["DEFERRED"],
+                fields=("board", "team_key"),
+                name="standing_board_team_key_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="boardstanding",
+            constraint=models.UniqueConstraint(
+                deferrable=models.Deferrable["DEFERRED"],
+                fields=("board", "rank"),
+                name="standing_board_rank_uniq",
+            ),
+        ),
+    ]
@@ -1,21 +1,21 @@
-import json
 from datetime import datetime
 
-import requests
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import F
 from django.urls import reverse
+from django.utils import timezone
 from polymorphic.models import PolymorphicModel
 
 from achievements import managers, CA_CHOICES
+from achievements.functions import get_team_key
 from bounty.models import Bounty
 from main import INTEGER, TIME
 from main.config import config
-from main.models import UMNotification
-from um.functions import get_file_path
+from main.models import Board, UMNotification, WebhookMessage
+from um.functions import changed_fields, get_file_path, loaded_values
 
 
 class BaseSubmission(PolymorphicModel):
@@ -57,18 +57,13 @@ class BaseSubmission(PolymorphicModel):
         """
         Post to discord um pb webhook the newly accepted submission!
         """
-        data = json.dumps(
+        WebhookMessage.enqueue(
+            config.UM_ACHIEVEMENT_SUBMISSIONS_DISCORD_WEBHOOK_URL,
             {
                 "embeds": [self.create_new_submission_embed()],
                 "components": self.create_new_submission_components(),
-            }
+            },
         )
-        if config.UM_ACHIEVEMENT_SUBMISSIONS_DISCORD_WEBHOOK_URL:
-            requests.post(
-                config.UM_ACHIEVEMENT_SUBMISSIONS_DISCORD_WEBHOOK_URL,
-                data=data,
-                headers={"Content-Type": "application/json"},
-            )
 
     def create_new_submission_embed(self):
         """
@@ -96,6 +91,15 @@ class BaseSubmission(PolymorphicModel):
             },
         ]
 
+        if isinstance(self.get_real_instance(), RecordSubmission):
+            fields.append(
+                {
+                    "name": "Rank",
+                    "value": self.get_rank() or "---",
+                    "inline": True,
+                }
+            )
+
         if self.notes:
             fields.append(
                 {
@@ -165,10 +169,12 @@ class BaseSubmission(PolymorphicModel):
         return components
 
     def get_rank(self):
-        submissions = self.board.top_unique_submissions()
-        for rank, submission in enumerate(submissions):
-            if submission.id == self.id:
-                return rank + 1
+        """
+        Return the leaderboard rank of this submission. Only record submissions are ranked.
+        """
+        real_instance = self.get_real_instance()
+        if isinstance(real_instance, RecordSubmission):
+            return real_instance.get_rank()
         return None
 
     def send_notifications(self, request):
@@ -199,6 +205,12 @@ class RecordSubmission(BaseSubmission):
         "main.Board", on_delete=models.CASCADE, related_name="submissions"
     )
     value = models.DecimalField(max_digits=7, decimal_places=2)
+    team_key = models.CharField(
+        max_length=40,
+        blank=True,
+        editable=False,
+        help_text="Hash of the sorted account ids of this submission, used to group submissions by team.",
+    )
 
     bounty_accepted = models.BooleanField(
         default=False,
@@ -209,10 +221,39 @@ class RecordSubmission(BaseSubmission):
     class Meta:
         verbose_name = "Record Submission"
         verbose_name_plural = "Record Submissions"
+        indexes = [
+            models.Index(
+                fields=["board", "team_key", "value"],
+                name="recordsub_board_team_value_idx",
+            ),
+        ]
+
+    # fields which change the standings of this submission's board
+    STANDINGS_FIELDS = ["accepted", "board_id"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = loaded_values(instance, cls.STANDINGS_FIELDS)
+        return instance
 
     def __str__(self):
         return f"{self.board}"
 
+    def save(self, *args, **kwargs):
+        changed = changed_fields(self, self.STANDINGS_FIELDS)
+        loaded = getattr(self, "_loaded_values", {})
+        was_accepted = loaded.get("accepted", self.accepted)
+        is_newly_accepted = self.accepted and "accepted" in changed
+        super(RecordSubmission, self).save(*args, **kwargs)
+        # newly accepted submissions update the standings in on_accepted(), so the rank posted to discord is current
+        if (self.accepted or was_accepted) and not is_newly_accepted:
+            self.board.update_standings()
+        if "board_id" in changed and loaded.get("board_id") is not None:
+            for board in Board.objects.filter(pk=loaded["board_id"]):
+                board.update_standings()
+        self._loaded_values = loaded_values(self, self.STANDINGS_FIELDS)
+
     def send_notifications(self, request):
         if self.accepted is not None:
             verb = f"{'accepted' if self.accepted else 'denied'} your submission for"
@@ -251,11 +292,10 @@ class RecordSubmission(BaseSubmission):
         """
         Post to discord um pb webhook the newly accepted submission!
         """
-        data = json.dumps({"embeds": [self.create_embed()]})
-        requests.post(
-            settings.UM_PB_DISCORD_WEBHOOK_URL,
-            data=data,
-            headers={"Content-Type": "application/json"},
+        self.board.update_standings()
+
+        WebhookMessage.enqueue(
+            settings.UM_PB_DISCORD_WEBHOOK_URL, {"embeds": [self.create_embed()]}
         )
 
         bounty = Bounty.get_current_bounty()
@@ -263,10 +303,16 @@ class RecordSubmission(BaseSubmission):
             bounty.on_accepted_submission(self)
 
     def get_rank(self):
-        submissions = self.board.top_unique_submissions()
-        for rank, submission in enumerate(submissions):
-            if submission.id == self.id:
-                return rank + 1
+        """
+        Return the leaderboard rank of this submission. For pending submissions, return the rank it would have if it
+        were accepted.
+        """
+        if self.accepted:
+            return self.board.get_rank(submission=self)
+        if self.accepted is None:
+            # team_key is updated in the database when the accounts are set, so it may be out of date on this instance
+            team_key = get_team_key(self.accounts.values_list("pk", flat=True))
+            return self.board.get_rank(value=self.value, team_key=team_key)
         return None
 
     def create_embed(self):
@@ -319,6 +365,49 @@ class RecordSubmission(BaseSubmission):
         return embed
 
 
+class BoardStanding(models.Model):
+    """
+    Precomputed leaderboard standings. Holds the top submission of each unique team on a board along with its rank,
+    i.e. the results of main.models.Board.top_unique_submissions(). Kept up to date by Board.update_standings().
+    """
+
+    board = models.ForeignKey(
+        "main.Board", on_delete=models.CASCADE, related_name="standings"
+    )
+    submission = models.OneToOneField(
+        "achievements.RecordSubmission",
+        on_delete=models.CASCADE,
+        related_name="standing",
+    )
+    team_key = models.CharField(max_length=40)
+    value = models.DecimalField(max_digits=7, decimal_places=2)
+    rank = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["board", "rank"]
+        # deferred, so Board.update_standings() can shift ranks without ordering its updates
+        constraints = [
+            models.UniqueConstraint(
+                fields=["board", "team_key"],
+                name="standing_board_team_key_uniq",
+                deferrable=models.Deferrable.DEFERRED,
+            ),
+            models.UniqueConstraint(
+                fields=["board", "rank"],
+                name="standing_board_rank_uniq",
+                deferrable=models.Deferrable.DEFERRED,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["board", "value"], name="standing_board_value_idx"),
+        ]
+        verbose_name = "Board Standing"
+        verbose_name_plural = "Board Standings"
+
+    def __str__(self):
+        return f"{self.board} - #{self.rank}"
+
+
 class PetSubmission(BaseSubmission):
     account = models.ForeignKey("account.Account", on_delete=models.CASCADE)
     pet = models.ForeignKey("main.Pet", on_delete=models.CASCADE)
@@ -465,3 +554,73 @@ class Hiscores(models.Model):
         return (
             f"{self.account.display_name} - {self.content.hiscores_name} {self.score}kc"
         )
+
+
+class HiscoresHistory(models.Model):
+    """
+    A change of an account's score in a content, appended by sync_hiscores whenever the score changes. Unranked
+    scores (-1) count as 0, and the first score synced for an account and content is the baseline, which has no
+    history.
+    """
+
+    account = models.ForeignKey(
+        "account.Account", on_delete=models.CASCADE, related_name="hiscores_history"
+    )
+    # indexed by the (content, recorded_at) index
+    content = models.ForeignKey(
+        "main.Content", on_delete=models.CASCADE, db_index=False
+    )
+    delta = models.IntegerField()
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    objects = managers.HiscoresHistoryQueryset.as_manager()
+
+    class Meta:
+        ordering = ["-recorded_at"]
+        verbose_name = "Hiscores History"
+        verbose_name_plural = "Hiscores History"
+        indexes = [
+            models.Index(
+                fields=["content", "recorded_at"],
+                name="hiscores_history_content_date",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.account} - {self.content} {self.delta:+}"
+
+
+class HiscoresSync(models.Model):
+    """
+    A run of the sync_hiscores command. Accounts are synced in primary key order, and checkpoint is the highest account
+    primary key up to which all accounts' hiscores have been written, so an interrupted run can be resumed.
+    """
+
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    checkpoint = models.PositiveBigIntegerField(null=True, blank=True)
+    accounts_synced = models.PositiveIntegerField(default=0)
+    hiscores_written = models.PositiveIntegerField(default=0)
+    hiscores_skipped = models.PositiveIntegerField(
+        default=0, help_text="Number of fetched hiscores which had not changed."
+    )
+    shard = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Shard of the accounts synced, when synced with several workers.",
+    )
+    workers = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Number of workers the accounts were sharded between.",
+    )
+
+    class Meta:
+        ordering = ["-started_at"]
+        verbose_name = "Hiscores Sync"
+        verbose_name_plural = "Hiscores Syncs"
+
+    def __str__(self):
+        if self.shard is not None:
+            return f"Hiscores sync {self.started_at:%b %d, %Y %H:%M} ({self.shard + 1}/{self.workers})"
+        return f"Hiscores sync {self.started_at:%b %d, %Y %H:%M}"
@@ -0,0 +1,75 @@
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+from django.dispatch import receiver
+
+from account.models import Account
+from achievements.models import RecordSubmission
+from main.models import Board
+
+__all__ = [
+    "record_submission_accounts_changed",
+    "record_submission_pre_delete",
+    "record_submission_deleted",
+]
+
+
+@receiver(m2m_changed, sender=RecordSubmission.accounts.through)
+def record_submission_accounts_changed(
+    sender, instance, action, reverse, pk_set, *args, **kwargs
+):
+    """
+    Signal for keeping the team_key, board standings and achievement points of an
+    achievements.models.RecordSubmission object in sync with its accounts.
+    """
+    if action == "pre_clear":
+        # pk_set is not given when clearing, so remember what is about to be cleared
+        if reverse:
+            related = instance.recordsubmission_set
+        else:
+            related = instance.accounts
+        instance._cleared_pks = list(related.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if action == "post_clear":
+        pk_set = getattr(instance, "_cleared_pks", [])
+
+    if reverse:
+        # instance is an account, and pk_set are the submissions it was added to/removed from
+        submissions = RecordSubmission.objects.filter(pk__in=pk_set)
+        accounts = [instance.pk]
+    else:
+        submissions = RecordSubmission.objects.filter(pk=instance.pk)
+        accounts = pk_set
+
+    submissions.update_team_keys()
+
+    # a different team of accounts may change the standings of the boards of accepted submissions
+    for board in Board.objects.filter(pk__in=submissions.accepted().values("board")):
+        board.update_standings()
+
+    # the standings only notice changes to which accounts are placed, not an account's best placement moving to
+    # another of its teams, so always update the points of the added/removed accounts here
+    if submissions.accepted().exists():
+        Account.objects.filter(pk__in=accounts).update_achievement_points()
+
+
+@receiver(pre_delete, sender=RecordSubmission)
+def record_submission_pre_delete(sender, instance, *args, **kwargs):
+    """
+    Signal for remembering the accounts of an achievements.models.RecordSubmission object before it is deleted.
+    """
+    instance._deleted_account_ids = list(instance.accounts.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=RecordSubmission)
+def record_submission_deleted(sender, instance, *args, **kwargs):
+    """
+    Signal for updating the standings of the board of a deleted achievements.models.RecordSubmission object, and
+    the achievement points of its accounts.
+    """
+    if instance.accepted:
+        for board in Board.objects.filter(pk=instance.board_id):
+            board.update_standings()
+        Account.objects.filter(
+            pk__in=getattr(instance, "_deleted_account_ids", [])
+        ).update_achievement_points()
@@ -0,0 +1,397 @@
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from account.models import Account
+from achievements.hiscores import HiscoresFetcher
+from achievements.models import Hiscores, HiscoresSync, RecordSubmission
+from main.models import Board, Content, ContentCategory, Settings
+
+PLACE_POINTS = {
+    "FIRST_PLACE_PTS": "5",
+    "SECOND_PLACE_PTS": "4",
+    "THIRD_PLACE_PTS": "3",
+    "FOURTH_PLACE_PTS": "2",
+    "FIFTH_PLACE_PTS": "1",
+}
+
+
+class BoardTestCase(TestCase):
+    def setUp(self):
+        for key, value in PLACE_POINTS.items():
+            Settings.objects.create(key=key, value=value)
+        category = ContentCategory.objects.create(name="Raids", slug="raids")
+        content = Content.objects.create(
+            name="Chambers of Xeric", slug="cox", category=category, has_pbs=True
+        )
+        # descending, so a higher value is better
+        content.ordering = "-"
+        content.save()
+        self.board = Board.objects.create(
+            name="Trio", content=content, team_size=3, slug="trio"
+        )
+        self.accounts = [
+            Account.objects.create(discord_id=str(i), name=f"account {i}")
+            for i in range(6)
+        ]
+
+    def submit(self, value, accounts):
+        submission = RecordSubmission.objects.create(
+            board=self.board, value=value, accepted=True
+        )
+        submission.accounts.set(accounts)
+        self.board.update_standings()
+        return submission
+
+    def get_points(self, account):
+        return Account.objects.get(pk=account.pk).achievement_points.points
+
+    def get_standings(self):
+        return list(
+            self.board.standings.values_list(
+                "pk", "submission", "team_key", "value", "rank"
+            )
+        )
+
+
+class UpdateStandingsTests(BoardTestCase):
+    def test_standings_are_ranked_by_value(self):
+        low = self.submit(10, self.accounts[:1])
+        high = self.submit(20, self.accounts[1:2])
+
+        self.assertEqual(
+            list(self.board.standings.values_list("submission", "rank")),
+            [(high.pk, 1), (low.pk, 2)],
+        )
+
+    def test_only_a_teams_best_submission_is_ranked(self):
+        self.submit(10, self.accounts[:1])
+        best = self.submit(20, self.accounts[:1])
+
+        self.assertEqual(
+            list(self.board.standings.values_list("submission", "rank")),
+            [(best.pk, 1)],
+        )
+
+    def test_new_submission_shifts_ranks(self):
+        first = self.submit(30, self.accounts[:1])
+        second = self.submit(10, self.accounts[1:2])
+        middle = self.submit(20, self.accounts[2:3])
+
+        self.assertEqual(
+            list(self.board.standings.values_list("submission", "rank")),
+            [(first.pk, 1), (middle.pk, 2), (second.pk, 3)],
+        )
+
+    def test_deleted_submission_is_removed(self):
+        first = self.submit(30, self.accounts[:1])
+        second = self.submit(10, self.accounts[1:2])
+        first.delete()
+
+        self.assertEqual(
+            list(self.board.standings.values_list("submission", "rank")),
+            [(second.pk, 1)],
+        )
+
+    def test_unchanged_standings_are_not_rewritten(self):
+        self.submit(30, self.accounts[:1])
+        self.submit(10, self.accounts[1:2])
+        standings = self.get_standings()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.board.update_standings()
+
+        # lock the board, read the ranked submissions and the standings, without the transaction's savepoint
+        statements = [
+            query["sql"]
+            for query in queries.captured_queries
+            if not query["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))
+        ]
+        self.assertEqual(len(statements), 3)
+        self.assertTrue(all(sql.startswith("SELECT") for sql in statements))
+        self.assertEqual(self.get_standings(), standings)
+
+    def test_only_changed_standings_are_rewritten(self):
+        first = self.submit(30, self.accounts[:1])
+        self.submit(10, self.accounts[1:2])
+        unchanged = first.standing.pk
+
+        self.submit(20, self.accounts[2:3])
+
+        self.assertEqual(self.board.standings.get(rank=1).pk, unchanged)
+
+
+class ChangedFieldsTests(BoardTestCase):
+    def test_denied_submission_is_removed_from_standings(self):
+        first = self.submit(30, self.accounts[:1])
+        second = self.submit(10, self.accounts[1:2])
+
+        submission = RecordSubmission.objects.get(pk=first.pk)
+        submission.accepted = False
+        submission.save()
+
+        self.assertEqual(
+            list(self.board.standings.values_list("submission", "rank")),
+            [(second.pk, 1)],
+        )
+
+    def test_deactivated_account_is_removed_from_standings(self):
+        self.submit(30, self.accounts[:1])
+        second = self.submit(10, self.accounts[1:2])
+
+        account = Account.objects.get(pk=self.accounts[0].pk)
+        account.is_active = False
+        account.save()
+
+        self.assertEqual(
+            list(self.board.standings.values_list("submission", "rank")),
+            [(second.pk, 1)],
+        )
+
+    def test_points_multiplier_change_updates_points(self):
+        self.submit(30, self.accounts[:1])
+
+        board = Board.objects.get(pk=self.board.pk)
+        board.points_multiplier = 2
+        board.save()
+
+        self.assertEqual(self.get_points(self.accounts[0]), 10)
+
+    def test_deferred_fields_are_not_loaded(self):
+        self.submit(30, self.accounts[:1])
+
+        # loading and saving only reads the board and writes its loaded fields
+        with self.assertNumQueries(2):
+            board = Board.objects.only("name").get(pk=self.board.pk)
+            board.name = "Trios"
+            board.save()
+
+
+class TeamChangePointsTests(BoardTestCase):
+    def test_account_added_to_placed_submission_gets_points(self):
+        submission = self.submit(30, self.accounts[:2])
+
+        submission.accounts.add(self.accounts[2])
+
+        self.assertEqual(self.get_points(self.accounts[2]), 5)
+
+    def test_account_removed_from_placed_submission_loses_points(self):
+        submission = self.submit(30, self.accounts[:2])
+
+        submission.accounts.remove(self.accounts[1])
+
+        self.assertEqual(self.get_points(self.accounts[0]), 5)
+        self.assertEqual(self.get_points(self.accounts[1]), 0)
+
+    def test_account_added_to_better_team_gets_better_placement(self):
+        first = self.submit(30, self.accounts[:1])
+        self.submit(20, self.accounts[1:2])
+        self.assertEqual(self.get_points(self.accounts[1]), 4)
+
+        first.accounts.add(self.accounts[1])
+
+        self.assertEqual(self.get_points(self.accounts[1]), 5)
+
+
+class PlacePointsSettingsTests(TestCase):
+    def test_place_points_can_be_added_one_at_a_time(self):
+        account = Account.objects.create(discord_id="0", name="account 0")
+
+        for key, value in PLACE_POINTS.items():
+            Settings.objects.create(key=key, value=value)
+
+        account.refresh_from_db()
+        self.assertEqual(account.achievement_points.points, 0)
+
+
+class StandInHiscores:
+    """
+    Local stand-in for the OSRS hiscores api. Each username is answered with the statuses queued for it in order,
+    and with 200 once they run out.
+    """
+
+    BODY = json.dumps({"activities": [{"name": "Zulrah", "score": 10, "rank": 1}]})
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.retry_after = "0.05"
+        self.statuses = defaultdict(list)
+        self.requests = defaultdict(int)
+        self.lock = threading.Lock()
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(stand_in.latency)
+                username = self.path.strip("/")
+                with stand_in.lock:
+                    stand_in.requests[username] += 1
+                    statuses = stand_in.statuses[username]
+                    status = statuses.pop(0) if statuses else 200
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", stand_in.retry_after)
+                body = stand_in.BODY.encode() if status == 200 else b""
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HiscoresFetcherTests(SimpleTestCase):
+    def setUp(self):
+        self.stand_in = StandInHiscores()
+        self.addCleanup(self.stand_in.close)
+        self.results = {}
+
+    def get_fetcher(self, **kwargs):
+        kwargs = {"backoff": 0.01, "target_latency": 1, **kwargs}
+        return HiscoresFetcher(api_url=self.stand_in.url, **kwargs)
+
+    async def on_result(self, pk, text):
+        self.results[pk] = text
+
+    async def test_fetches_all_accounts(self):
+        fetcher = self.get_fetcher()
+
+        await fetcher.fetch_all([(i, f"player{i}") for i in range(20)], self.on_result)
+
+        self.assertEqual(self.results, {i: StandInHiscores.BODY for i in range(20)})
+        self.assertEqual(len(fetcher.latencies), 20)
+        self.assertEqual(fetcher.failed, [])
+
+    async def test_rate_limited_and_server_errors_are_retried(self):
+        self.stand_in.statuses["limited"] = [429, 429]
+        self.stand_in.statuses["erroring"] = [503]
+        fetcher = self.get_fetcher()
+
+        await fetcher.fetch_all([(1, "limited"), (2, "erroring")], self.on_result)
+
+        self.assertEqual(
+            self.results, {1: StandInHiscores.BODY, 2: StandInHiscores.BODY}
+        )
+        self.assertEqual(self.stand_in.requests["limited"], 3)
+        self.assertEqual(fetcher.retries, 3)
+
+    async def test_gives_up_after_max_retries(self):
+        self.stand_in.statuses["down"] = [500] * 10
+        fetcher = self.get_fetcher(max_retries=2)
+
+        await fetcher.fetch_all([(1, "down")], self.on_result)
+
+        self.assertEqual(self.results, {1: None})
+        self.assertEqual(self.stand_in.requests["down"], 3)
+        self.assertEqual(fetcher.failed, ["down (500)"])
+
+    async def test_missing_players_are_not_retried(self):
+        self.stand_in.statuses["renamed"] = [404]
+        fetcher = self.get_fetcher()
+
+        await fetcher.fetch_all([(1, "renamed")], self.on_result)
+
+        self.assertEqual(self.results, {1: None})
+        self.assertEqual(self.stand_in.requests["renamed"], 1)
+        self.assertEqual(fetcher.failed, ["renamed (404)"])
+
+    async def test_backoff_does_not_hold_up_other_accounts(self):
+        self.stand_in.retry_after = "0.5"
+        self.stand_in.statuses["limited"] = [429]
+        order = []
+        fetcher = self.get_fetcher(max_concurrency=1, initial_concurrency=1)
+
+        async def on_result(pk, text):
+            order.append(pk)
+
+        await fetcher.fetch_all(
+            [(0, "limited")] + [(i, f"player{i}") for i in range(1, 6)], on_result
+        )
+
+        self.assertEqual(order, [1, 2, 3, 4, 5, 0])
+
+    async def test_concurrency_grows_while_fast(self):
+        fetcher = self.get_fetcher(initial_concurrency=2, max_concurrency=10)
+
+        await fetcher.fetch_all([(i, f"player{i}") for i in range(30)], self.on_result)
+
+        self.assertGreater(fetcher.limit, 2)
+
+    async def test_concurrency_halves_when_rate_limited(self):
+        for i in range(10):
+            self.stand_in.statuses[f"player{i}"] = [429]
+        fetcher = self.get_fetcher(initial_concurrency=8, max_concurrency=8)
+
+        await fetcher.fetch_all([(i, f"player{i}") for i in range(10)], self.on_result)
+
+        self.assertLess(fetcher.limit, 8)
+        self.assertEqual(len(self.results), 10)
+
+    async def test_concurrency_halves_when_slow(self):
+        self.stand_in.latency = 0.1
+        fetcher = self.get_fetcher(
+            initial_concurrency=8, max_concurrency=8, target_latency=0.05
+        )
+
+        await fetcher.fetch_all([(i, f"player{i}") for i in range(4)], self.on_result)
+
+        self.assertLess(fetcher.limit, 8)
+
+
+class SyncHiscoresTests(TransactionTestCase):
+    def setUp(self):
+        self.stand_in = StandInHiscores()
+        self.addCleanup(self.stand_in.close)
+        category = ContentCategory.objects.create(name="Bosses", slug="bosses")
+        Content.objects.create(
+            name="Zulrah", hiscores_name="Zulrah", slug="zulrah", category=category
+        )
+        self.accounts = [
+            Account.objects.create(discord_id=str(i), name=f"player{i}")
+            for i in range(5)
+        ]
+
+    def sync(self):
+        call_command("sync_hiscores", api_url=self.stand_in.url, stdout=mock.Mock())
+        # the hiscores are written from sync_to_async's thread, whose connection would keep the test database open
+        asyncio.run(sync_to_async(connections.close_all)())
+        return HiscoresSync.objects.latest("pk")
+
+    @mock.patch("achievements.management.commands.sync_hiscores.CHECKPOINT_INTERVAL", 2)
+    def test_current_scores_are_loaded_per_batch(self):
+        with mock.patch.object(
+            Hiscores.objects, "filter", wraps=Hiscores.objects.filter
+        ) as load:
+            sync = self.sync()
+
+        # 5 accounts in batches of 2
+        self.assertEqual(load.call_count, 3)
+        self.assertEqual(sync.accounts_synced, 5)
+        self.assertEqual(sync.checkpoint, self.accounts[-1].pk)
+
+    def test_only_changed_hiscores_are_written(self):
+        first = self.sync()
+        second = self.sync()
+
+        self.assertEqual((first.hiscores_written, first.hiscores_skipped), (5, 0))
+        self.assertEqual((second.hiscores_written, second.hiscores_skipped), (0, 5))
+        self.assertEqual(Hiscores.objects.count(), 5)
@@ -1,6 +1,3 @@
-import json
-
-import requests
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
@@ -9,6 +6,7 @@ from django.urls import reverse
 from django.utils import timezone
 
 from main.functions import gp_display
+from main.models import WebhookMessage
 
 
 class Bounty(models.Model):
@@ -68,11 +66,8 @@ class Bounty(models.Model):
                 f"The prize pool for the bounty has increased to {gp_display(self.prize_pool)}.",
                 thumbnail=static("bounty/img/CoinStack.webp"),
             )
-            data = json.dumps({"embeds": [embed]})
-            requests.post(
-                settings.BOUNTY_DISCORD_WEBHOOK_URL,
-                data=data,
-                headers={"Content-Type": "application/json"},
+            WebhookMessage.enqueue(
+                settings.BOUNTY_DISCORD_WEBHOOK_URL, {"embeds": [embed]}
             )
 
     @classmethod
@@ -116,11 +111,9 @@ class Bounty(models.Model):
             title = "Bounty Claimed"
             users = ", ".join(submission.accounts.values_list("name", flat=True))
             description = f"{users} submitted a time of {submission.value_display()} to claim {rank_display} place."
-            data = json.dumps({"embeds": [self.create_embed(title, description)]})
-            requests.post(
+            WebhookMessage.enqueue(
                 settings.BOUNTY_DISCORD_WEBHOOK_URL,
-                data=data,
-                headers={"Content-Type": "application/json"},
+                {"embeds": [self.create_embed(title, description)]},
             )
 
         # Updates for slowest bounty submission if applicable to this bounty
@@ -135,11 +128,9 @@ class Bounty(models.Model):
         #     title = "Bounty Claimed"
         #     users = ", ".join(submission.accounts.values_list("name", flat=True))
         #     description = f"{users} submitted a time of {submission.value_display()} to claim the slowest time of the bounty."
-        #     data = json.dumps({"embeds": [self.create_embed(title, description)]})
-        #     requests.post(
+        #     WebhookMessage.enqueue(
         #         settings.BOUNTY_DISCORD_WEBHOOK_URL,
-        #         data=data,
-        #         headers={"Content-Type": "application/json"},
+        #         {"embeds": [self.create_embed(title, description)]},
         #     )
 
     def create_embed(self, title, description, thumbnail=None):
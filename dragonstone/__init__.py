@@ -15,3 +15,11 @@ EVENT_CHOICES = (
     (MAJOR, "Major Event"),
     (OTHER, "Other"),
 )
+
+PENDING, RUNNING, DONE, FAILED = range(4)
+RECALCULATION_STATUS_CHOICES = (
+    (PENDING, "Pending"),
+    (RUNNING, "Running"),
+    (DONE, "Done"),
+    (FAILED, "Failed"),
+)
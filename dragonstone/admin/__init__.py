@@ -1,2 +1,3 @@
 from dragonstone.admin.points import *
 from dragonstone.admin.submissions import *
+from dragonstone.admin.recalculations import *
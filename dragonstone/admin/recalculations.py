@@ -0,0 +1,56 @@
+from django.contrib import admin
+
+from dragonstone import PENDING
+from dragonstone import models
+
+__all__ = ["PointsRecalculationAdmin"]
+
+
+class PointsRecalculationAccountAdminInline(admin.TabularInline):
+    model = models.PointsRecalculationAccount
+    extra = 0
+    can_delete = False
+    readonly_fields = ["account", "points_before", "points_after"]
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(models.PointsRecalculation)
+class PointsRecalculationAdmin(admin.ModelAdmin):
+    list_display = [
+        "key",
+        "points",
+        "status",
+        "progress_display",
+        "created_at",
+        "started_at",
+        "finished_at",
+    ]
+    list_filter = ["status", "key"]
+    readonly_fields = [
+        "key",
+        "points",
+        "status",
+        "progress_display",
+        "created_at",
+        "started_at",
+        "finished_at",
+        "heartbeat_at",
+        "error",
+    ]
+    exclude = ["total", "processed"]
+    inlines = [PointsRecalculationAccountAdminInline]
+    actions = ["retry"]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description="Progress")
+    def progress_display(self, obj):
+        return obj.progress_display()
+
+    @admin.action(description="Retry selected recalculations")
+    def retry(self, request, queryset):
+        # running a recalculation twice at once, or a done one again, would apply its points twice
+        queryset.retryable().update(status=PENDING)
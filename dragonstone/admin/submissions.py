@@ -3,6 +3,7 @@ from django.contrib import admin
 
 from dragonstone import models
 from dragonstone.admin import inlines
+from dragonstone.models import batch_expiration_updates
 
 __all__ = [
     "DragonstoneBaseSubmissionAdmin",
@@ -14,6 +15,17 @@ __all__ = [
 ]
 
 
+class PointsSubmissionAdmin(admin.ModelAdmin):
+    """
+    Admin of a submission type whose points are edited inline.
+    """
+
+    def save_related(self, request, form, formsets, change):
+        # recalculate each account's dragonstone expiration once, not after saving each of its points
+        with batch_expiration_updates():
+            super().save_related(request, form, formsets, change)
+
+
 @admin.register(models.DragonstoneBaseSubmission)
 class DragonstoneBaseSubmissionAdmin(admin.ModelAdmin):
     list_display = [
@@ -35,7 +47,7 @@ class DragonstoneBaseSubmissionAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.PVMSplitSubmission)
-class PVMSplitSubmissionAdmin(admin.ModelAdmin):
+class PVMSplitSubmissionAdmin(PointsSubmissionAdmin):
     inlines = [inlines.PVMSplitPointsAdminInline]
     autocomplete_fields = ["content"]
     list_display = ["accounts_display", "content", "proof", "date", "accepted"]
@@ -67,7 +79,7 @@ class PVMSplitSubmissionAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.MentorSubmission)
-class MentorSubmissionAdmin(admin.ModelAdmin):
+class MentorSubmissionAdmin(PointsSubmissionAdmin):
     inlines = [inlines.MentorPointsAdminInline]
     autocomplete_fields = ["learners", "content"]
     list_display = ["mentors_display", "content", "proof", "date", "accepted"]
@@ -100,7 +112,7 @@ class MentorSubmissionAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.EventSubmission)
-class EventSubmissionAdmin(admin.ModelAdmin):
+class EventSubmissionAdmin(PointsSubmissionAdmin):
     inlines = [
         inlines.EventHostPointsAdminInline,
         inlines.EventParticipantPointsAdminInline,
@@ -137,7 +149,7 @@ class EventSubmissionAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.NewMemberRaidSubmission)
-class NewMemberRaidSubmissionAdmin(admin.ModelAdmin):
+class NewMemberRaidSubmissionAdmin(PointsSubmissionAdmin):
     inlines = [
         inlines.NewMemberRaidPointsAdminInline,
     ]
@@ -172,7 +184,7 @@ class NewMemberRaidSubmissionAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.GroupCASubmission)
-class GroupCASubmissionAdmin(admin.ModelAdmin):
+class GroupCASubmissionAdmin(PointsSubmissionAdmin):
     inlines = [inlines.GroupCAPointsAdminInline]
     autocomplete_fields = ["content"]
     list_display = [
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DragonstoneConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "dragonstone"
+
+    def ready(self):
+        from dragonstone import signals
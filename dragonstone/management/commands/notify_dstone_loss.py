@@ -1,6 +1,5 @@
-from datetime import timedelta
-
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 
 from account.models import Account
 from main.config import config
@@ -10,16 +9,19 @@ class Command(BaseCommand):
     help = "Notify any loss of dragonstone rank for all users. Run once every hour automatically through a scheduler."
 
     def handle(self, *args, **options):
-        # accounts who have dstone as of now
-        current_dstones = Account.objects.dragonstone_points().filter(
-            annotated_dragonstone_pts__gte=config.DRAGONSTONE_POINTS_THRESHOLD
+        # accounts whose dragonstone rank has expired since they were last checked, this also catches up on any
+        # missed runs since an expiration date is only cleared once it has been handled here
+        expired = list(
+            Account.objects.filter(
+                dragonstone_expires_at__lte=timezone.now()
+            ).dragonstone_points()
         )
 
-        # accounts who had dstone as of an hour ago
-        prev_dstones = Account.objects.dragonstone_points(
-            delta=timedelta(hours=-1)
-        ).filter(annotated_dragonstone_pts__gte=config.DRAGONSTONE_POINTS_THRESHOLD)
-
-        for account in prev_dstones:
-            if account not in current_dstones:
+        for account in expired:
+            # the account may have regained the rank since, which has already been notified
+            if account.annotated_dragonstone_pts < config.DRAGONSTONE_POINTS_THRESHOLD:
                 account.notify_dstone_status_change()
+
+        Account.objects.filter(
+            pk__in=[account.pk for account in expired]
+        ).update_dragonstone_expiration(force=True)
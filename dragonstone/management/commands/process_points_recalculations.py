@@ -0,0 +1,54 @@
+import traceback
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from dragonstone import RUNNING, FAILED
+from dragonstone.models import PointsRecalculation
+
+
+class Command(BaseCommand):
+    help = (
+        "Run all pending dragonstone points recalculations, oldest first. Running recalculations which made no "
+        "progress for PointsRecalculation.STALE_AFTER are assumed to have died with their process, and are run again. "
+        "Run every few minutes automatically through a scheduler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of dragonstone points updated per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            with transaction.atomic():
+                # skip recalculations another run of this command is already picking up
+                recalculation = (
+                    PointsRecalculation.objects.select_for_update(skip_locked=True)
+                    .due()
+                    .order_by("created_at")
+                    .first()
+                )
+                if recalculation is None:
+                    break
+                recalculation.status = RUNNING
+                recalculation.heartbeat_at = timezone.now()
+                recalculation.save(update_fields=["status", "heartbeat_at"])
+
+            self.stdout.write(f"Recalculating {recalculation}...")
+            try:
+                recalculation.run(chunk_size=options["chunk_size"])
+            except Exception:
+                recalculation.status = FAILED
+                recalculation.error = traceback.format_exc()
+                recalculation.save(update_fields=["status", "error"])
+                self.stderr.write(recalculation.error)
+                continue
+            self.stdout.write(
+                f"Recalculated {recalculation.total} points for "
+                f"{recalculation.accounts.count()} accounts."
+            )
@@ -1,13 +1,17 @@
 from datetime import timedelta
 
-from django.db.models import Q
+from django.db.models import Q, QuerySet
 from django.utils import timezone
 from polymorphic.managers import PolymorphicQuerySet
 
-from dragonstone import models
+from dragonstone import FAILED, PENDING, RUNNING
 from main.config import config
 
-__all__ = ["DragonstonePointsQueryset", "DragonstoneSubmissionQueryset"]
+__all__ = [
+    "DragonstonePointsQueryset",
+    "DragonstoneSubmissionQueryset",
+    "PointsRecalculationQueryset",
+]
 
 
 class DragonstonePointsQueryset(PolymorphicQuerySet):
@@ -15,38 +19,10 @@ class DragonstonePointsQueryset(PolymorphicQuerySet):
         expiration_period = timezone.now() - timedelta(
             days=config.DRAGONSTONE_EXPIRATION_PERIOD
         )
-
-        return self.filter(
-            Q(
-                Q(instance_of=models.FreeformPoints)
-                | Q(instance_of=models.RecruitmentPoints)
-                | Q(instance_of=models.SotMPoints)
-                | Q(pvmsplitpoints__submission__accepted=True)
-                | Q(mentorpoints__submission__accepted=True)
-                | Q(eventhostpoints__submission__accepted=True)
-                | Q(eventparticipantpoints__submission__accepted=True)
-                | Q(eventdonorpoints__submission__accepted=True)
-                | Q(newmemberraidpoints__submission__accepted=True)
-                | Q(groupcapoints__submission__accepted=True)
-            )
-            & Q(date__gte=expiration_period)
-        )
+        return self.filter(accepted=True, date__gte=expiration_period)
 
     def accepted(self):
-        return self.filter(
-            Q(
-                Q(instance_of=models.FreeformPoints)
-                | Q(instance_of=models.RecruitmentPoints)
-                | Q(instance_of=models.SotMPoints)
-                | Q(pvmsplitpoints__submission__accepted=True)
-                | Q(mentorpoints__submission__accepted=True)
-                | Q(eventhostpoints__submission__accepted=True)
-                | Q(eventparticipantpoints__submission__accepted=True)
-                | Q(eventdonorpoints__submission__accepted=True)
-                | Q(newmemberraidpoints__submission__accepted=True)
-                | Q(groupcapoints__submission__accepted=True)
-            )
-        )
+        return self.filter(accepted=True)
 
     def expired(self, expired=True, delta=timedelta(0)):
         """
@@ -63,6 +39,12 @@ class DragonstonePointsQueryset(PolymorphicQuerySet):
             Q(**{"date__lt" if expired else "date__gte": expiration_period})
         )
 
+    def delete(self):
+        from dragonstone.models import batch_expiration_updates
+
+        with batch_expiration_updates():
+            return super().delete()
+
 
 class DragonstoneSubmissionQueryset(PolymorphicQuerySet):
     def accepted(self):
@@ -76,3 +58,33 @@ class DragonstoneSubmissionQueryset(PolymorphicQuerySet):
             days=config.DRAGONSTONE_EXPIRATION_PERIOD
         )
         return self.filter(date__gte=expiration_period)
+
+    def delete(self):
+        from dragonstone.models import batch_expiration_updates
+
+        # deleting submissions deletes their points too
+        with batch_expiration_updates():
+            return super().delete()
+
+
+class PointsRecalculationQueryset(QuerySet):
+    def stale(self):
+        """
+        Return the running recalculations whose process seems to have died, since they haven't made any progress in
+        the last STALE_AFTER.
+        """
+        return self.filter(
+            status=RUNNING, heartbeat_at__lt=timezone.now() - self.model.STALE_AFTER
+        )
+
+    def due(self):
+        """
+        Return the recalculations which are waiting to be run: pending ones, and stale ones to be picked up again.
+        """
+        return self.filter(Q(status=PENDING) | Q(pk__in=self.stale().values("pk")))
+
+    def retryable(self):
+        """
+        Return the recalculations which can safely be run again: failed ones, and stale ones.
+        """
+        return self.filter(Q(status=FAILED) | Q(pk__in=self.stale().values("pk")))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dragonstone", "0027_groupcapoints_groupcasubmission_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dragonstonepoints",
+            name="accepted",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="Copy of the accepted state of the submission these points belong to.",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dragonstonepoints",
+            index=models.Index(
+                fields=["account", "accepted", "date"],
+                name="dstone_pts_acc_accepted_date",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def forward(apps, schema_data):
+    # points without a submission are always accepted
+    for model_name in ["FreeformPoints", "RecruitmentPoints", "SotMPoints"]:
+        apps.get_model("dragonstone", model_name).objects.update(accepted=True)
+
+    for model_name in [
+        "PVMSplitPoints",
+        "MentorPoints",
+        "EventHostPoints",
+        "EventParticipantPoints",
+        "EventDonorPoints",
+        "NewMemberRaidPoints",
+        "GroupCAPoints",
+    ]:
+        apps.get_model("dragonstone", model_name).objects.filter(
+            submission__accepted=True
+        ).update(accepted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dragonstone", "0028_dragonstonepoints_accepted_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, reverse_code=migrations.RunPython.noop),
+    ]
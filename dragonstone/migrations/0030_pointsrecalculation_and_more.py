@@ -0,0 +1,113 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0024_account_dragonstone_expires_at"),
+        ("dragonstone", "0029_populate_dragonstonepoints_accepted_20261018_1200"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PointsRecalculation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=256)),
+                ("points", models.PositiveIntegerField()),
+                (
+                    "status",
+                    models.PositiveIntegerField(
+                        choices=[
+                            (0, "Pending"),
+                            (1, "Running"),
+                            (2, "Done"),
+                            (3, "Failed"),
+                        ],
+                        default=0,
+                    ),
+                ),
+                (
+                    "total",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of dragonstone points to recalculate.",
+                    ),
+                ),
+                (
+                    "processed",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of dragonstone points recalculated so far.",
+                    ),
+                ),
+                ("error", models.TextField(blank=True)),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Points Recalculation",
+                "verbose_name_plural": "Points Recalculations",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "created_at"],
+                        name="dstone_recalc_status_created",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="PointsRecalculationAccount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("points_before", models.PositiveIntegerField()),
+                ("points_after", models.PositiveIntegerField(blank=True, null=True)),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="points_recalculations",
+                        to="account.account",
+                    ),
+                ),
+                (
+                    "recalculation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="accounts",
+                        to="dragonstone.pointsrecalculation",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Points Recalculation Account",
+                "verbose_name_plural": "Points Recalculation Accounts",
+                "unique_together": {("recalculation", "account")},
+            },
+        ),
+    ]
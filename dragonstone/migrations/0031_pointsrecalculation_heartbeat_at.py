@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dragonstone", "0030_pointsrecalculation_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pointsrecalculation",
+            name="heartbeat_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Date this recalculation last made progress while running.",
+                null=True,
+            ),
+        ),
+    ]
@@ -1,2 +1,3 @@
 from dragonstone.models.points import *
 from dragonstone.models.submissions import *
+from dragonstone.models.recalculations import *
@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 
 from django.db import models
@@ -14,8 +16,11 @@ from dragonstone import (
 from dragonstone import managers
 from main import EASY, MEDIUM, HARD, VERY_HARD, SKILLS
 from main.config import config
+from um.functions import changed_fields, loaded_values
 
 __all__ = [
+    "batch_expiration_updates",
+    "update_expiration",
     "DragonstonePoints",
     "FreeformPoints",
     "RecruitmentPoints",
@@ -29,6 +34,42 @@ __all__ = [
     "GroupCAPoints",
 ]
 
+# accounts whose stored dragonstone expiration date is waiting on the end of a batch_expiration_updates() block
+_batched_accounts = ContextVar("batched_accounts", default=None)
+
+
+@contextmanager
+def batch_expiration_updates():
+    """
+    Update the stored dragonstone expiration dates of the accounts whose points are saved or deleted inside this
+    block once at the end of it, instead of after each save or delete.
+    """
+    if _batched_accounts.get() is not None:
+        yield
+        return
+    accounts = set()
+    token = _batched_accounts.set(accounts)
+    try:
+        yield
+    finally:
+        _batched_accounts.reset(token)
+    update_expiration(accounts)
+
+
+def update_expiration(accounts):
+    """
+    Update the stored dragonstone expiration date of the given account primary keys, or add them to the current
+    batch_expiration_updates() block.
+    """
+    from account.models import Account
+
+    accounts = {pk for pk in accounts if pk is not None}
+    batched = _batched_accounts.get()
+    if batched is not None:
+        batched.update(accounts)
+    elif accounts:
+        Account.objects.filter(pk__in=accounts).update_dragonstone_expiration()
+
 
 class DragonstonePoints(PolymorphicModel):
     account = models.ForeignKey(
@@ -38,16 +79,50 @@ class DragonstonePoints(PolymorphicModel):
     )
     points = models.PositiveIntegerField(default=0)
     date = models.DateTimeField(default=datetime.now)
+    accepted = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Copy of the accepted state of the submission these points belong to.",
+    )
 
     objects = managers.DragonstonePointsQueryset.as_manager()
 
     class Meta:
         verbose_name = "Dragonstone Points"
         verbose_name_plural = "All Dragonstone Points"
+        indexes = [
+            models.Index(
+                fields=["account", "accepted", "date"],
+                name="dstone_pts_acc_accepted_date",
+            ),
+        ]
+
+    # fields which change the stored dragonstone expiration date of the account
+    EXPIRATION_FIELDS = ["account_id", "points", "date", "accepted"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = loaded_values(instance, cls.EXPIRATION_FIELDS)
+        return instance
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
+        if is_new:
+            # points without a submission (freeform, recruitment and skill of the month points) are always accepted
+            submission = getattr(self, "submission", None)
+            self.accepted = submission.accepted is True if submission else True
+        loaded = getattr(self, "_loaded_values", None)
+        if is_new or loaded is None:
+            changed = self.EXPIRATION_FIELDS
+        else:
+            changed = changed_fields(self, self.EXPIRATION_FIELDS)
+        loaded = loaded or {}
         super(DragonstonePoints, self).save(*args, **kwargs)
+        # points which aren't accepted (e.g. of a pending submission) don't count towards the dragonstone rank
+        if changed and (self.accepted or loaded.get("accepted")):
+            update_expiration([self.account_id, loaded.get("account_id")])
+        self._loaded_values = loaded_values(self, self.EXPIRATION_FIELDS)
         if is_new:
             # get_child_instance seems to return self if there is no child. This works out
             # because this code still runs successfully when a child instance is saved!
@@ -56,9 +131,18 @@ class DragonstonePoints(PolymorphicModel):
     def on_created(self):
         """
         Post to discord dragonstone updates webhook if a user now qualifies for dragonstone
-        because of these points being created
+        because of these points being created.
+        Dragonstone rank updates for points of a submission are handled on the submission when it is accepted, so
+        this only applies to points without a submission, or points added to an already accepted submission.
         """
-        return self.get_real_instance().on_created()
+        from account.models import Account
+
+        if self.accepted:
+            gained, _ = Account.objects.filter(
+                pk=self.account_id
+            ).dragonstone_threshold_crossings(added=[self.pk])
+            for account in gained:
+                account.notify_dstone_status_change()
 
 
 class FreeformPoints(DragonstonePoints):
@@ -68,12 +152,6 @@ class FreeformPoints(DragonstonePoints):
         verbose_name = "Freeform Points"
         verbose_name_plural = "Freeform Points"
 
-    def on_created(self):
-        current_pts = self.account.get_dragonstone_pts()
-        prev_pts = self.account.get_dragonstone_pts(ignore=[self.pk])
-        if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-            self.account.notify_dstone_status_change()
-
 
 class RecruitmentPoints(DragonstonePoints):
     recruited = models.ForeignKey("account.Account", on_delete=models.CASCADE)
@@ -87,12 +165,6 @@ class RecruitmentPoints(DragonstonePoints):
             self.points = config.RECRUITER_PTS
         super().save(*args, **kwargs)
 
-    def on_created(self):
-        current_pts = self.account.get_dragonstone_pts()
-        prev_pts = self.account.get_dragonstone_pts(ignore=[self.pk])
-        if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-            self.account.notify_dstone_status_change()
-
 
 class SotMPoints(DragonstonePoints):
     rank = models.PositiveIntegerField(choices=((1, "1st"), (2, "2nd"), (3, "3rd")))
@@ -115,12 +187,6 @@ class SotMPoints(DragonstonePoints):
                 self.points = config.SOTM_THIRD_PTS
         super().save(*args, **kwargs)
 
-    def on_created(self):
-        current_pts = self.account.get_dragonstone_pts()
-        prev_pts = self.account.get_dragonstone_pts(ignore=[self.pk])
-        if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-            self.account.notify_dstone_status_change()
-
 
 class PVMSplitPoints(DragonstonePoints):
     submission = models.ForeignKey(
@@ -146,18 +212,6 @@ class PVMSplitPoints(DragonstonePoints):
             self.date = self.submission.date
         super().save(*args, **kwargs)
 
-    def on_created(self):
-        """
-        Dragonstone rank updates are handled on the parent submission for this type of point.
-        Below code handles fringe case of adding more points to a submission in the admin
-        after the submission has already been accepted!
-        """
-        if self.submission.accepted:
-            current_pts = self.account.get_dragonstone_pts()
-            prev_pts = self.account.get_dragonstone_pts(ignore=[self.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                self.account.notify_dstone_status_change()
-
 
 class MentorPoints(DragonstonePoints):
     submission = models.ForeignKey(
@@ -183,18 +237,6 @@ class MentorPoints(DragonstonePoints):
             self.date = self.submission.date
         super().save(*args, **kwargs)
 
-    def on_created(self):
-        """
-        Dragonstone rank updates are handled on the parent submission for this type of point.
-        Below code handles fringe case of adding more points to a submission in the admin
-        after the submission has already been accepted!
-        """
-        if self.submission.accepted:
-            current_pts = self.account.get_dragonstone_pts()
-            prev_pts = self.account.get_dragonstone_pts(ignore=[self.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                self.account.notify_dstone_status_change()
-
 
 class EventHostPoints(DragonstonePoints):
     submission = models.ForeignKey(
@@ -220,18 +262,6 @@ class EventHostPoints(DragonstonePoints):
         self.date = self.submission.date
         super().save(*args, **kwargs)
 
-    def on_created(self):
-        """
-        Dragonstone rank updates are handled on the parent submission for this type of point.
-        Below code handles fringe case of adding more points to a submission in the admin
-        after the submission has already been accepted!
-        """
-        if self.submission.accepted:
-            current_pts = self.account.get_dragonstone_pts()
-            prev_pts = self.account.get_dragonstone_pts(ignore=[self.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                self.account.notify_dstone_status_change()
-
 
 class EventParticipantPoints(DragonstonePoints):
     submission = models.ForeignKey(
@@ -257,18 +287,6 @@ class EventParticipantPoints(DragonstonePoints):
         self.date = self.submission.date
         super().save(*args, **kwargs)
 
-    def on_created(self):
-        """
-        Dragonstone rank updates are handled on the parent submission for this type of point.
-        Below code handles fringe case of adding more points to a submission in the admin
-        after the submission has already been accepted!
-        """
-        if self.submission.accepted:
-            current_pts = self.account.get_dragonstone_pts()
-            prev_pts = self.account.get_dragonstone_pts(ignore=[self.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                self.account.notify_dstone_status_change()
-
 
 class EventDonorPoints(DragonstonePoints):
     submission = models.ForeignKey(
@@ -294,18 +312,6 @@ class EventDonorPoints(DragonstonePoints):
             self.date = self.submission.date
         super().save(*args, **kwargs)
 
-    def on_created(self):
-        """
-        Dragonstone rank updates are handled on the parent submission for this type of point.
-        Below code handles fringe case of adding more points to a submission in the admin
-        after the submission has already been accepted!
-        """
-        if self.submission.accepted:
-            current_pts = self.account.get_dragonstone_pts()
-            prev_pts = self.account.get_dragonstone_pts(ignore=[self.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                self.account.notify_dstone_status_change()
-
 
 class NewMemberRaidPoints(DragonstonePoints):
     submission = models.ForeignKey(
@@ -323,18 +329,6 @@ class NewMemberRaidPoints(DragonstonePoints):
             self.points = config.NEW_MEMBER_RAID_PTS
         super().save(*args, **kwargs)
 
-    def on_created(self):
-        """
-        Dragonstone rank updates are handled on the parent submission for this type of point.
-        Below code handles fringe case of adding more points to a submission in the admin
-        after the submission has already been accepted!
-        """
-        if self.submission.accepted:
-            current_pts = self.account.get_dragonstone_pts()
-            prev_pts = self.account.get_dragonstone_pts(ignore=[self.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                self.account.notify_dstone_status_change()
-
 
 class GroupCAPoints(DragonstonePoints):
     submission = models.ForeignKey(
@@ -357,15 +351,3 @@ class GroupCAPoints(DragonstonePoints):
                 self.points = config.GROUP_CA_GRANDMASTER_POINTS
             self.date = self.submission.date
         super().save(*args, **kwargs)
-
-    def on_created(self):
-        """
-        Dragonstone rank updates are handled on the parent submission for this type of point.
-        Below code handles fringe case of adding more points to a submission in the admin
-        after the submission has already been accepted!
-        """
-        if self.submission.accepted:
-            current_pts = self.account.get_dragonstone_pts()
-            prev_pts = self.account.get_dragonstone_pts(ignore=[self.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                self.account.notify_dstone_status_change()
@@ -0,0 +1,301 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from dragonstone import (
+    PVM,
+    SKILLING,
+    MAJOR,
+    OTHER,
+    EVENT_MENTOR,
+    PENDING,
+    RUNNING,
+    DONE,
+    RECALCULATION_STATUS_CHOICES,
+)
+from dragonstone import managers
+from dragonstone.models.points import (
+    DragonstonePoints,
+    RecruitmentPoints,
+    SotMPoints,
+    PVMSplitPoints,
+    MentorPoints,
+    EventHostPoints,
+    EventParticipantPoints,
+    EventDonorPoints,
+    NewMemberRaidPoints,
+)
+from main import EASY, MEDIUM, HARD, VERY_HARD
+from main.config import config
+from main.models import WebhookMessage
+from main.webhooks import MAX_DESCRIPTION_LENGTH, split_embeds
+
+__all__ = ["PointsRecalculation", "PointsRecalculationAccount"]
+
+
+class PointsRecalculation(models.Model):
+    """
+    A job recalculating the stored points of all DragonstonePoints affected by a change of a points main.models.Settings
+    value. Created when the Settings object is saved, and processed in chunks outside the request by the
+    process_points_recalculations command.
+    """
+
+    key = models.CharField(max_length=256)
+    points = models.PositiveIntegerField()
+    status = models.PositiveIntegerField(
+        choices=RECALCULATION_STATUS_CHOICES, default=PENDING
+    )
+    total = models.PositiveIntegerField(
+        default=0, help_text="Number of dragonstone points to recalculate."
+    )
+    processed = models.PositiveIntegerField(
+        default=0, help_text="Number of dragonstone points recalculated so far."
+    )
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Date this recalculation last made progress while running.",
+    )
+
+    objects = managers.PointsRecalculationQueryset.as_manager()
+
+    # a running recalculation which made no progress for this long is assumed to have died, and is picked up again
+    STALE_AFTER = timedelta(minutes=30)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Points Recalculation"
+        verbose_name_plural = "Points Recalculations"
+        indexes = [
+            models.Index(
+                fields=["status", "created_at"], name="dstone_recalc_status_created"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.key} = {self.points} ({self.get_status_display()})"
+
+    @staticmethod
+    def get_points_mapping():
+        """
+        Return a dict mapping each points Settings key to a queryset of all DragonstonePoints whose points it sets.
+        """
+        return {
+            "RECRUITER_PTS": RecruitmentPoints.objects.all(),
+            "SOTM_FIRST_PTS": SotMPoints.objects.filter(rank=1),
+            "SOTM_SECOND_PTS": SotMPoints.objects.filter(rank=2),
+            "SOTM_THIRD_PTS": SotMPoints.objects.filter(rank=3),
+            "PVM_SPLIT_EASY_PTS": PVMSplitPoints.objects.filter(
+                submission__content__difficulty=EASY
+            ),
+            "PVM_SPLIT_MEDIUM_PTS": PVMSplitPoints.objects.filter(
+                submission__content__difficulty=MEDIUM
+            ),
+            "PVM_SPLIT_HARD_PTS": PVMSplitPoints.objects.filter(
+                submission__content__difficulty=HARD
+            ),
+            "PVM_SPLIT_VERY_HARD_PTS": PVMSplitPoints.objects.filter(
+                submission__content__difficulty=VERY_HARD
+            ),
+            "MENTOR_EASY_PTS": MentorPoints.objects.filter(
+                submission__content__difficulty=EASY
+            ),
+            "MENTOR_MEDIUM_PTS": MentorPoints.objects.filter(
+                submission__content__difficulty=MEDIUM
+            ),
+            "MENTOR_HARD_PTS": MentorPoints.objects.filter(
+                submission__content__difficulty=HARD
+            ),
+            "MENTOR_VERY_HARD_PTS": MentorPoints.objects.filter(
+                submission__content__difficulty=VERY_HARD
+            ),
+            "EVENT_MINOR_HOSTS_PTS": EventHostPoints.objects.filter(
+                Q(submission__type=PVM) | Q(submission__type=SKILLING)
+            ),
+            "EVENT_MINOR_PARTICIPANTS_PTS": EventParticipantPoints.objects.filter(
+                Q(submission__type=PVM) | Q(submission__type=SKILLING)
+            ),
+            "EVENT_MINOR_DONORS_PTS": EventDonorPoints.objects.filter(
+                Q(submission__type=PVM) | Q(submission__type=SKILLING)
+            ),
+            "EVENT_MENTOR_HOSTS_PTS": EventHostPoints.objects.filter(
+                submission__type=EVENT_MENTOR
+            ),
+            "EVENT_MENTOR_PARTICIPANTS_PTS": EventParticipantPoints.objects.filter(
+                submission__type=EVENT_MENTOR
+            ),
+            "EVENT_MENTOR_DONORS_PTS": EventDonorPoints.objects.filter(
+                submission__type=EVENT_MENTOR
+            ),
+            "EVENT_MAJOR_HOSTS_PTS": EventHostPoints.objects.filter(
+                submission__type=MAJOR
+            ),
+            "EVENT_MAJOR_PARTICIPANTS_PTS": EventParticipantPoints.objects.filter(
+                submission__type=MAJOR
+            ),
+            "EVENT_MAJOR_DONORS_PTS": EventDonorPoints.objects.filter(
+                submission__type=MAJOR
+            ),
+            "EVENT_OTHER_HOSTS_PTS": EventHostPoints.objects.filter(
+                submission__type=OTHER
+            ),
+            "EVENT_OTHER_PARTICIPANTS_PTS": EventParticipantPoints.objects.filter(
+                submission__type=OTHER
+            ),
+            "EVENT_OTHER_DONORS_PTS": EventDonorPoints.objects.filter(
+                submission__type=OTHER
+            ),
+            "NEW_MEMBER_RAID_PTS": NewMemberRaidPoints.objects.all(),
+        }
+
+    def get_points(self):
+        """
+        Return a queryset of all DragonstonePoints whose points are set by the Settings key of this recalculation.
+        """
+        return self.get_points_mapping()[self.key]
+
+    def run(self, chunk_size=1000):
+        """
+        Set the points of all DragonstonePoints affected by this recalculation, chunk_size points per transaction.
+        The dragonstone points of each affected account are recorded before and after, and any resulting dragonstone
+        rank changes are posted to discord.
+        Updating the points is idempotent, so a failed recalculation can safely be run again.
+        """
+        from account.models import Account
+
+        points = self.get_points().exclude(points=self.points)
+        point_ids = list(points.values_list("pk", flat=True))
+        self.status = RUNNING
+        self.started_at = self.heartbeat_at = timezone.now()
+        self.total = self.processed + len(point_ids)
+        self.error = ""
+        self.save(
+            update_fields=["status", "started_at", "heartbeat_at", "total", "error"]
+        )
+
+        # include the accounts recorded by a previous failed run, whose points may already have been updated
+        accounts = Account.objects.filter(
+            Q(pk__in=points.values("account"))
+            | Q(points_recalculations__recalculation=self)
+        ).distinct()
+        PointsRecalculationAccount.objects.bulk_create(
+            [
+                PointsRecalculationAccount(
+                    recalculation=self, account_id=pk, points_before=pts
+                )
+                for pk, pts in accounts.dragonstone_points().values_list(
+                    "pk", "annotated_dragonstone_pts"
+                )
+            ],
+            ignore_conflicts=True,
+            batch_size=500,
+        )
+
+        for i in range(0, len(point_ids), chunk_size):
+            chunk = point_ids[i : i + chunk_size]
+            with transaction.atomic():
+                DragonstonePoints.objects.filter(pk__in=chunk).update(
+                    points=self.points
+                )
+                self.processed += len(chunk)
+                self.heartbeat_at = timezone.now()
+                self.save(update_fields=["processed", "heartbeat_at"])
+
+        results = {result.account_id: result for result in self.accounts.all()}
+        for pk, pts in accounts.dragonstone_points().values_list(
+            "pk", "annotated_dragonstone_pts"
+        ):
+            results[pk].points_after = pts
+        PointsRecalculationAccount.objects.bulk_update(
+            results.values(), ["points_after"], batch_size=500
+        )
+        accounts.update_dragonstone_expiration()
+        self.notify_rank_changes()
+
+        self.status = DONE
+        self.finished_at = timezone.now()
+        self.save(update_fields=["status", "finished_at"])
+
+    def create_rank_changes_embeds(self):
+        """
+        Create json discord embeds listing the accounts which gained or lost the dragonstone rank because of this
+        recalculation, with as many accounts per embed as fit in its description.
+        """
+        threshold = config.DRAGONSTONE_POINTS_THRESHOLD
+        lines = []
+        for result in self.accounts.select_related("account"):
+            if result.points_before < threshold <= result.points_after:
+                lines.append(
+                    f"<@{result.account.discord_id}> has gained enough points for the rank of dragonstone!"
+                )
+            elif result.points_after < threshold <= result.points_before:
+                lines.append(
+                    f"<@{result.account.discord_id}> has lost their dragonstone rank."
+                )
+        descriptions = []
+        for line in lines:
+            if (
+                descriptions
+                and len(descriptions[-1]) + len(line) + 1 <= MAX_DESCRIPTION_LENGTH
+            ):
+                descriptions[-1] += f"\n{line}"
+            else:
+                descriptions.append(line)
+        return [
+            {
+                "color": 0x0099FF,
+                "title": "Dragonstone Rank Update",
+                "description": description,
+            }
+            for description in descriptions
+        ]
+
+    def notify_rank_changes(self):
+        """
+        Post all dragonstone rank changes caused by this recalculation to the #dragonstone-updates channel, in as few
+        messages as discord's limits allow.
+        """
+        for embeds in split_embeds(self.create_rank_changes_embeds()):
+            WebhookMessage.enqueue(
+                settings.DRAGONSTONE_UPDATES_DISCORD_WEBHOOK_URL, {"embeds": embeds}
+            )
+
+    def progress_display(self):
+        if not self.total:
+            return "-"
+        percentage = self.processed * 100 // self.total
+        return f"{self.processed}/{self.total} ({percentage}%)"
+
+
+class PointsRecalculationAccount(models.Model):
+    """
+    The total dragonstone points of an account affected by a PointsRecalculation, before and after it ran.
+    """
+
+    recalculation = models.ForeignKey(
+        "dragonstone.PointsRecalculation",
+        on_delete=models.CASCADE,
+        related_name="accounts",
+    )
+    account = models.ForeignKey(
+        "account.Account",
+        on_delete=models.CASCADE,
+        related_name="points_recalculations",
+    )
+    points_before = models.PositiveIntegerField()
+    points_after = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ["recalculation", "account"]
+        verbose_name = "Points Recalculation Account"
+        verbose_name_plural = "Points Recalculation Accounts"
+
+    def __str__(self):
+        return f"{self.account}: {self.points_before} -> {self.points_after}"
@@ -1,18 +1,17 @@
-import json
 from datetime import datetime
-from itertools import chain
 
-import requests
 from django.conf import settings
 from django.db import models
-from django.db.models import F
+from django.db.models import F, Q
 from django.urls import reverse
 from polymorphic.models import PolymorphicModel
 
 from achievements import CA_CHOICES
 from dragonstone import EVENT_CHOICES
 from dragonstone import managers
+from dragonstone.models.points import DragonstonePoints, batch_expiration_updates
 from main.config import config
+from main.models import WebhookMessage
 from um.functions import get_file_path
 
 __all__ = [
@@ -53,34 +52,72 @@ class DragonstoneBaseSubmission(PolymorphicModel):
 
     def save(self, *args, **kwargs):
         super(DragonstoneBaseSubmission, self).save(*args, **kwargs)
+        if self.accepted != self.__original_accepted:
+            self.update_points_accepted()
         if self.accepted and self.accepted != self.__original_accepted:
             # get_child_instance seems to return self if there is no child. This works out
             # because this code still runs successfully when a child instance is saved!
             self.on_accepted()
 
+    def delete(self, *args, **kwargs):
+        # deleting a submission deletes its points too
+        with batch_expiration_updates():
+            return super().delete(*args, **kwargs)
+
+    def get_points(self):
+        """
+        Return all dragonstone points belonging to this submission, whatever the submission type.
+        """
+        return DragonstonePoints.objects.filter(
+            Q(pvmsplitpoints__submission=self.pk)
+            | Q(mentorpoints__submission=self.pk)
+            | Q(eventhostpoints__submission=self.pk)
+            | Q(eventparticipantpoints__submission=self.pk)
+            | Q(eventdonorpoints__submission=self.pk)
+            | Q(newmemberraidpoints__submission=self.pk)
+            | Q(groupcapoints__submission=self.pk)
+        )
+
+    def update_points_accepted(self):
+        """
+        Copy the accepted state of this submission onto all of its points.
+        """
+        from account.models import Account
+
+        points = self.get_points()
+        points.update(accepted=self.accepted is True)
+        Account.objects.filter(
+            pk__in=points.values("account")
+        ).update_dragonstone_expiration()
+
     def on_creation(self):
         """
         Post to discord dragonstone submission webhook the newly created submission
         """
-        data = json.dumps(
+        WebhookMessage.enqueue(
+            config.UM_DRAGONSTONE_SUBMISSIONS_DISCORD_WEBHOOK_URL,
             {
                 "embeds": [self.create_new_submission_embed()],
                 "components": self.create_new_submission_components(),
-            }
+            },
         )
-        if config.UM_DRAGONSTONE_SUBMISSIONS_DISCORD_WEBHOOK_URL:
-            requests.post(
-                config.UM_DRAGONSTONE_SUBMISSIONS_DISCORD_WEBHOOK_URL,
-                data=data,
-                headers={"Content-Type": "application/json"},
-            )
 
     def on_accepted(self):
         """
         Post to discord dragonstone updates webhook if a user now qualifies for dragonstone
-        because of this submission being accepted
+        because of this submission being accepted.
+        The points before and after accepting are compared for all accounts of the submission in a single query.
         """
-        return self.get_real_instance().on_accepted()
+        from account.models import Account
+
+        points = self.get_points()
+        gained, _ = Account.objects.filter(
+            pk__in=points.values("account")
+        ).dragonstone_threshold_crossings(
+            added=list(points.values_list("pk", flat=True))
+        )
+        for account in gained:
+            account.notify_dstone_status_change()
 
     def create_new_submission_embed(self):
         return self.get_real_instance().create_new_submission_embed()
@@ -201,13 +238,6 @@ class PVMSplitSubmission(DragonstoneBaseSubmission):
     def accounts_display(self):
         return ", ".join([account.display_name for account in self.accounts.all()])
 
-    def on_accepted(self):
-        for pt in self.points.all():
-            current_pts = pt.account.get_dragonstone_pts()
-            prev_pts = pt.account.get_dragonstone_pts(ignore=[pt.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                pt.account.notify_dstone_status_change()
-
 
 class MentorSubmission(DragonstoneBaseSubmission):
     UPLOAD_TO = "dragonstone/mentor/proof/"
@@ -295,13 +325,6 @@ class MentorSubmission(DragonstoneBaseSubmission):
     def accounts_display(self):
         return ", ".join([mentor.display_name for mentor in self.mentors.all()])
 
-    def on_accepted(self):
-        for pt in self.mentor_points.all():
-            current_pts = pt.account.get_dragonstone_pts()
-            prev_pts = pt.account.get_dragonstone_pts(ignore=[pt.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                pt.account.notify_dstone_status_change()
-
 
 class EventSubmission(DragonstoneBaseSubmission):
     UPLOAD_TO = "dragonstone/event/proof/"
@@ -418,33 +441,6 @@ class EventSubmission(DragonstoneBaseSubmission):
             roles += ["Donor"]
         return ", ".join(roles)
 
-    def on_accepted(self):
-        from account.models import Account
-
-        host_points = self.host_points.all()
-        participant_points = self.participant_points.all()
-        donor_points = self.donor_points.all()
-        accounts_pks = list(
-            chain(
-                host_points.values_list("account", flat=True),
-                participant_points.values_list("account", flat=True),
-                donor_points.values_list("account", flat=True),
-            )
-        )
-        accounts = Account.objects.filter(pk__in=accounts_pks)
-        for account in accounts:
-            current_pts = account.get_dragonstone_pts()
-            ignore = []
-            if account.pk in host_points.values_list("account", flat=True):
-                ignore.append(host_points.get(account=account).pk)
-            if account.pk in participant_points.values_list("account", flat=True):
-                ignore.append(participant_points.get(account=account).pk)
-            if account.pk in donor_points.values_list("account", flat=True):
-                ignore.append(donor_points.get(account=account).pk)
-            prev_pts = account.get_dragonstone_pts(ignore=ignore)
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                account.notify_dstone_status_change()
-
 
 class NewMemberRaidSubmission(DragonstoneBaseSubmission):
     UPLOAD_TO = "dragonstone/new_member_raid/proof/"
@@ -534,13 +530,6 @@ class NewMemberRaidSubmission(DragonstoneBaseSubmission):
     def accounts_display(self):
         return ", ".join([account.display_name for account in self.accounts.all()])
 
-    def on_accepted(self):
-        for pt in self.points.all():
-            current_pts = pt.account.get_dragonstone_pts()
-            prev_pts = pt.account.get_dragonstone_pts(ignore=[pt.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                pt.account.notify_dstone_status_change()
-
 
 class GroupCASubmission(DragonstoneBaseSubmission):
     UPLOAD_TO = "dragonstone/group_ca/proof/"
@@ -625,10 +614,3 @@ class GroupCASubmission(DragonstoneBaseSubmission):
 
     def accounts_display(self):
         return ", ".join([account.display_name for account in self.accounts.all()])
-
-    def on_accepted(self):
-        for pt in self.points.all():
-            current_pts = pt.account.get_dragonstone_pts()
-            prev_pts = pt.account.get_dragonstone_pts(ignore=[pt.pk])
-            if current_pts >= config.DRAGONSTONE_POINTS_THRESHOLD > prev_pts:
-                pt.account.notify_dstone_status_change()
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from dragonstone.models import DragonstonePoints, update_expiration
+
+__all__ = ["dragonstone_points_deleted"]
+
+
+@receiver(post_delete, sender=DragonstonePoints)
+def dragonstone_points_deleted(sender, instance, *args, **kwargs):
+    """
+    Signal for keeping the stored dragonstone expiration date of an account up to date when its points are deleted.
+    """
+    if instance.accepted:
+        update_expiration([instance.account_id])
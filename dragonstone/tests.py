@@ -0,0 +1,178 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from account.managers import AccountQueryset
+from account.models import Account
+from dragonstone import DONE, FAILED, PENDING, RUNNING
+from dragonstone.admin import PointsRecalculationAdmin
+from dragonstone.models import (
+    DragonstonePoints,
+    FreeformPoints,
+    PointsRecalculation,
+    PointsRecalculationAccount,
+    batch_expiration_updates,
+)
+from main.management.commands.fake_discord_webhooks import validate_payload
+from main.models import Settings, WebhookMessage
+
+
+@override_settings(DRAGONSTONE_UPDATES_DISCORD_WEBHOOK_URL="http://discord.test/hook")
+@mock.patch(
+    "dragonstone.models.recalculations.config",
+    mock.Mock(DRAGONSTONE_POINTS_THRESHOLD=100),
+)
+class RankChangesNotificationTests(TestCase):
+    def create_results(self, count, points_before, points_after):
+        recalculation = PointsRecalculation.objects.create(
+            key="RECRUITER_PTS", points=5
+        )
+        for i in range(count):
+            account = Account.objects.create(
+                discord_id=str(10**17 + i), name=f"account {i}"
+            )
+            PointsRecalculationAccount.objects.create(
+                recalculation=recalculation,
+                account=account,
+                points_before=points_before,
+                points_after=points_after,
+            )
+        return recalculation
+
+    def test_few_rank_changes_are_one_message(self):
+        self.create_results(3, 90, 110).notify_rank_changes()
+
+        payload = WebhookMessage.objects.get().payload
+        self.assertIsNone(validate_payload(payload))
+        self.assertEqual(payload["embeds"][0]["description"].count("\n"), 2)
+
+    def test_many_rank_changes_are_split_within_discord_limits(self):
+        self.create_results(300, 110, 90).notify_rank_changes()
+
+        payloads = [message.payload for message in WebhookMessage.objects.all()]
+        self.assertGreater(len(payloads), 1)
+        for payload in payloads:
+            self.assertIsNone(validate_payload(payload))
+        lines = [
+            line
+            for payload in payloads
+            for embed in payload["embeds"]
+            for line in embed["description"].split("\n")
+        ]
+        self.assertEqual(len(lines), 300)
+
+    def test_no_rank_changes_posts_nothing(self):
+        self.create_results(3, 110, 120).notify_rank_changes()
+
+        self.assertFalse(WebhookMessage.objects.exists())
+
+
+class ExpirationUpdateTests(TestCase):
+    def setUp(self):
+        for key, value in [
+            ("DRAGONSTONE_POINTS_THRESHOLD", "10"),
+            ("DRAGONSTONE_EXPIRATION_PERIOD", "180"),
+            ("CAPPED_POINTS_MAX", "10"),
+        ]:
+            Settings.objects.create(key=key, value=value)
+        self.user = User.objects.create(username="admin")
+        self.accounts = [
+            Account.objects.create(discord_id=str(i), name=f"account {i}")
+            for i in range(5)
+        ]
+
+    def add_points(self, account, points=10):
+        return FreeformPoints.objects.create(
+            account=account, points=points, created_by=self.user
+        )
+
+    def test_points_update_the_expiration_date(self):
+        self.add_points(self.accounts[0])
+
+        self.accounts[0].refresh_from_db()
+        self.assertIsNotNone(self.accounts[0].dragonstone_expires_at)
+
+    def test_batch_updates_the_expiration_dates_once(self):
+        with mock.patch.object(
+            AccountQueryset, "update_dragonstone_expiration", autospec=True
+        ) as update:
+            with batch_expiration_updates():
+                for account in self.accounts:
+                    self.add_points(account)
+
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(
+            set(update.call_args.args[0].values_list("pk", flat=True)),
+            {account.pk for account in self.accounts},
+        )
+
+    def test_bulk_delete_updates_the_expiration_dates_once(self):
+        for account in self.accounts:
+            self.add_points(account)
+
+        with mock.patch.object(
+            AccountQueryset, "update_dragonstone_expiration", autospec=True
+        ) as update:
+            DragonstonePoints.objects.all().delete()
+
+        self.assertEqual(update.call_count, 1)
+
+    def test_unchanged_points_do_not_update_the_expiration_date(self):
+        points = self.add_points(self.accounts[0])
+
+        with mock.patch.object(
+            AccountQueryset, "update_dragonstone_expiration", autospec=True
+        ) as update:
+            points = DragonstonePoints.objects.get(pk=points.pk)
+            points.save()
+
+        update.assert_not_called()
+
+
+class RecalculationRetryTests(TestCase):
+    def create(self, status, heartbeat_age=timedelta(0)):
+        return PointsRecalculation.objects.create(
+            key="RECRUITER_PTS",
+            points=5,
+            status=status,
+            heartbeat_at=timezone.now() - heartbeat_age,
+        )
+
+    def test_retry_only_requeues_failed_and_stale_recalculations(self):
+        failed = self.create(FAILED)
+        stale = self.create(RUNNING, PointsRecalculation.STALE_AFTER * 2)
+        running = self.create(RUNNING)
+        done = self.create(DONE)
+
+        PointsRecalculationAdmin(PointsRecalculation, admin.site).retry(
+            None, PointsRecalculation.objects.all()
+        )
+
+        self.assertEqual(
+            {
+                recalculation.pk: recalculation.status
+                for recalculation in PointsRecalculation.objects.all()
+            },
+            {
+                failed.pk: PENDING,
+                stale.pk: PENDING,
+                running.pk: RUNNING,
+                done.pk: DONE,
+            },
+        )
+
+    def test_stale_recalculations_are_run_again(self):
+        stale = self.create(RUNNING, PointsRecalculation.STALE_AFTER * 2)
+        running = self.create(RUNNING)
+
+        with mock.patch.object(PointsRecalculation, "run", autospec=True) as run:
+            call_command("process_points_recalculations", stdout=mock.Mock())
+
+        self.assertEqual([call.args[0].pk for call in run.call_args_list], [stale.pk])
+        running.refresh_from_db()
+        self.assertEqual(running.status, RUNNING)
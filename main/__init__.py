@@ -69,3 +69,10 @@ SKILLS = (
     (HUNTER, "Hunter"),
     (CONSTRUCTION, "Construction"),
 )
+
+WEBHOOK_PENDING, WEBHOOK_SENT, WEBHOOK_DROPPED = range(3)
+WEBHOOK_STATUS_CHOICES = (
+    (WEBHOOK_PENDING, "Pending"),
+    (WEBHOOK_SENT, "Sent"),
+    (WEBHOOK_DROPPED, "Dropped"),
+)
@@ -2,9 +2,10 @@ import adminactions.actions as actions
 from admin_auto_filters.filters import AutocompleteFilterFactory
 from django.contrib import admin
 from django.contrib.admin import site
+from django.utils import timezone
 from notifications.models import Notification
 
-from main import models
+from main import models, WEBHOOK_PENDING, WEBHOOK_SENT
 
 
 @admin.register(models.ContentCategory)
@@ -126,6 +127,33 @@ class SettingsAdmin(admin.ModelAdmin):
     search_fields = ["key"]
 
 
+@admin.register(models.WebhookMessage)
+class WebhookMessageAdmin(admin.ModelAdmin):
+    list_display = ["url", "status", "attempts", "created_at", "sent_at"]
+    list_filter = ["status", "created_at"]
+    readonly_fields = [
+        "url",
+        "payload",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "created_at",
+        "sent_at",
+        "error",
+    ]
+    actions = ["retry"]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Retry selected messages")
+    def retry(self, request, queryset):
+        # sent messages are left alone, and retried messages get a full set of attempts again
+        queryset.exclude(status=WEBHOOK_SENT).update(
+            status=WEBHOOK_PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+
+
 admin.site.unregister(
     Notification
 )  # unregister Notification model from admin, since we have our own UMNotification model + admin
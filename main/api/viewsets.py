@@ -25,7 +25,7 @@ class BoardViewSet(viewsets.ModelViewSet):
     def top_unique_submissions(self, request, pk=None):
         board = self.get_object()
         return Response(
-            RecordSubmissionSerializer(board.top_unique_submissions(), many=True).data
+            RecordSubmissionSerializer(board.ranked_submissions(), many=True).data
         )
 
 
@@ -1,4 +1,6 @@
-from main.models import Settings
+import time
+
+from main.models import Settings, SettingsVersion
 
 __all__ = ["config"]
 
@@ -6,16 +8,49 @@ __all__ = ["config"]
 class Config:
     """
     Config wrapper for main.models.Settings to allow simpler and more elegant use of the Settings model.
+
+    All Settings are loaded in a single query and kept in process memory. Every CHECK_INTERVAL seconds the
+    SettingsVersion counter is checked, and the Settings are only reloaded if another process has changed them.
     """
 
+    CHECK_INTERVAL = 5  # in seconds
+
+    def __init__(self):
+        self._values = None
+        self._version = None
+        self._checked_at = 0
+
     def __getattr__(self, key):
+        if key.startswith("_"):
+            raise AttributeError(key)
         try:
-            value = Settings.objects.get(key=key).value
+            return self._get_values()[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def _get_values(self):
+        now = time.monotonic()
+        if self._values is None or now - self._checked_at >= self.CHECK_INTERVAL:
+            version = SettingsVersion.current()
+            if self._values is None or version != self._version:
+                self._load(version)
+            self._checked_at = now
+        return self._values
+
+    def _load(self, version):
+        values = {}
+        for key, value in Settings.objects.values_list("key", "value"):
             if value.isnumeric():
                 value = int(value)
-            return value
-        except Settings.DoesNotExist:
-            raise AttributeError(key)
+            values[key] = value
+        self._values = values
+        self._version = version
+
+    def expire(self):
+        """
+        Force the Settings to be reloaded on next access.
+        """
+        self._values = None
 
 
 config = Config()
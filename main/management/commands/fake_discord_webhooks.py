@@ -0,0 +1,223 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from main.webhooks import (
+    MAX_DESCRIPTION_LENGTH,
+    MAX_EMBEDS,
+    MAX_EMBEDS_LENGTH,
+    embeds_length,
+)
+
+MAX_ACTION_ROWS = 5
+
+
+class FakeDiscord:
+    """
+    State of the fake discord webhook server: the recorded payloads, a sliding window rate limit per route, and
+    throughput statistics per route.
+    """
+
+    def __init__(self, rate_limit, rate_window, record=None):
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.record = record
+        self.lock = threading.Lock()
+        self.requests = defaultdict(deque)
+        self.stats = defaultdict(lambda: {"posted": 0, "rate_limited": 0, "invalid": 0})
+        self.started_at = time.monotonic()
+
+    def check_rate_limit(self, route):
+        """
+        Register a request to route, and return (remaining, reset_after) if it is allowed, or (0, retry_after) with
+        allowed False if it is rate limited.
+        """
+        now = time.monotonic()
+        with self.lock:
+            requests = self.requests[route]
+            while requests and requests[0] <= now - self.rate_window:
+                requests.popleft()
+            reset_after = (
+                requests[0] + self.rate_window - now if requests else self.rate_window
+            )
+            if len(requests) >= self.rate_limit:
+                self.stats[route]["rate_limited"] += 1
+                return False, 0, reset_after
+            requests.append(now)
+            return True, self.rate_limit - len(requests), reset_after
+
+    def store(self, route, payload):
+        with self.lock:
+            self.stats[route]["posted"] += 1
+            if self.record:
+                self.record.write(
+                    json.dumps({"route": route, "payload": payload}) + "\n"
+                )
+                self.record.flush()
+
+    def invalid(self, route):
+        with self.lock:
+            self.stats[route]["invalid"] += 1
+
+    def stats_display(self):
+        elapsed = time.monotonic() - self.started_at
+        with self.lock:
+            return "\n".join(
+                f"{route}: {stats['posted']} posted ({stats['posted'] / elapsed:.2f}/s), "
+                f"{stats['rate_limited']} rate limited, {stats['invalid']} invalid"
+                for route, stats in sorted(self.stats.items())
+            )
+
+
+def validate_payload(payload):
+    """
+    Return an error message if discord would reject the webhook payload, or None if it is valid.
+    """
+    if not isinstance(payload, dict):
+        return "Payload must be a JSON object"
+    embeds = payload.get("embeds", [])
+    if not payload.get("content") and not embeds:
+        return "Cannot send an empty message"
+    if len(embeds) > MAX_EMBEDS:
+        return f"Must be {MAX_EMBEDS} or fewer embeds"
+    if any(
+        len(embed.get("description", "")) > MAX_DESCRIPTION_LENGTH for embed in embeds
+    ):
+        return (
+            f"Embed descriptions must be {MAX_DESCRIPTION_LENGTH} or fewer characters"
+        )
+    if embeds_length(embeds) > MAX_EMBEDS_LENGTH:
+        return f"Embeds must be {MAX_EMBEDS_LENGTH} or fewer characters in total"
+    if len(payload.get("components", [])) > MAX_ACTION_ROWS:
+        return f"Must be {MAX_ACTION_ROWS} or fewer action rows"
+    return None
+
+
+def get_handler(discord, latency, jitter):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            time.sleep(max(latency + random.uniform(-jitter, jitter), 0))
+            route = self.path.split("?")[0]
+
+            allowed, remaining, reset_after = discord.check_rate_limit(route)
+            headers = {
+                "X-RateLimit-Limit": discord.rate_limit,
+                "X-RateLimit-Remaining": remaining,
+                "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+                "X-RateLimit-Bucket": route,
+            }
+            if not allowed:
+                headers["Retry-After"] = f"{reset_after:.3f}"
+                return self.respond(
+                    429,
+                    {
+                        "message": "You are being rate limited.",
+                        "retry_after": reset_after,
+                    },
+                    headers,
+                )
+
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+            except ValueError:
+                payload = None
+            error = validate_payload(payload)
+            if error:
+                discord.invalid(route)
+                return self.respond(400, {"message": error, "code": 50035}, headers)
+
+            discord.store(route, payload)
+            self.respond(204, None, headers)
+
+        def respond(self, status, body, headers):
+            self.send_response(status)
+            for header, value in headers.items():
+                self.send_header(header, str(value))
+            if body is None:
+                self.end_headers()
+                return
+            data = json.dumps(body).encode()
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for discord's webhook endpoint, for testing and load testing the webhook code paths "
+        "offline. Point the discord webhook urls in the settings to http://<host>:<port>/api/webhooks/<name>."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.1,
+            help="Seconds each request takes to respond.",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0.05,
+            help="Maximum seconds the latency randomly varies by.",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=int,
+            default=5,
+            help="Number of requests allowed per route within --rate-window.",
+        )
+        parser.add_argument(
+            "--rate-window",
+            type=float,
+            default=2,
+            help="Seconds of the rate limit window.",
+        )
+        parser.add_argument(
+            "--record",
+            help="File to append each received payload to, one JSON object per line.",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=10,
+            help="Seconds between printing the throughput of each route.",
+        )
+
+    def handle(self, *args, **options):
+        record = open(options["record"], "a") if options["record"] else None
+        discord = FakeDiscord(options["rate_limit"], options["rate_window"], record)
+        server = ThreadingHTTPServer(
+            (options["host"], options["port"]),
+            get_handler(discord, options["latency"], options["jitter"]),
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.stdout.write(
+            f"Fake discord webhooks listening on http://{options['host']}:{options['port']}/api/webhooks/<name>"
+        )
+        try:
+            while True:
+                time.sleep(options["stats_interval"])
+                if discord.stats:
+                    self.stdout.write(discord.stats_display())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            if record:
+                record.close()
+            self.stdout.write(discord.stats_display())
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db.models import ManyToOneRel, ManyToManyRel, OneToOneRel
 
 from account import models
+from achievements.models import RecordSubmission
 
 
 def update_reverse_references(obj, new_obj, exclude=None):
@@ -57,3 +58,6 @@ class Command(BaseCommand):
                 raise CommandError(f"No account found with name: {account_name}")
             update_reverse_references(other_account, main_account, exclude=["hiscores"])
             other_account.delete()
+
+        # the merged submissions now have a different team of accounts
+        RecordSubmission.objects.filter(accounts=main_account).update_team_keys()
@@ -0,0 +1,238 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+
+import requests
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main import WEBHOOK_PENDING, WEBHOOK_SENT, WEBHOOK_DROPPED
+from main.models import WebhookMessage
+from main.webhooks import MAX_EMBEDS, MAX_EMBEDS_LENGTH, embeds_length, webhook_client
+
+MAX_ATTEMPTS = 8
+# claimed messages are not due again until this long after they were claimed, in case the claiming worker dies
+CLAIM_TIMEOUT = timedelta(minutes=5)
+PRUNE_INTERVAL = 60 * 60  # in seconds
+
+
+def coalesce(messages):
+    """
+    Group consecutive messages to the same webhook url which only contain embeds, so each group can be posted as a
+    single discord message within discord's limits on the number and size of embeds per message.
+    Messages with other content, like the accept/deny buttons of new submissions, are always posted on their own.
+    Return a list of (payload, messages) tuples.
+    """
+    groups = []
+    for message in messages:
+        embeds = message.payload.get("embeds", [])
+        if set(message.payload) == {"embeds"} and groups:
+            payload, group = groups[-1]
+            combined = payload.get("embeds", []) + embeds
+            if (
+                set(payload) == {"embeds"}
+                and len(combined) <= MAX_EMBEDS
+                and embeds_length(combined) <= MAX_EMBEDS_LENGTH
+            ):
+                groups[-1] = ({"embeds": combined}, group + [message])
+                continue
+        groups.append((message.payload, [message]))
+    return groups
+
+
+def post_messages(messages):
+    """
+    Post messages to the same webhook url in order, coalescing embeds into as few discord messages as possible, and
+    stopping at the first failure so the order is kept when retrying.
+    Return a list of (message, exception) tuples, where exception is None if the message was posted.
+    """
+    results = []
+    for payload, group in coalesce(messages):
+        try:
+            webhook_client.send(group[0].url, payload)
+        except requests.RequestException as e:
+            results.extend((message, e) for message in group)
+            break
+        results.extend((message, None) for message in group)
+    return results
+
+
+def is_permanent_failure(exception):
+    """
+    Return whether retrying a message which failed with exception can never succeed, i.e. discord rejected it.
+    """
+    response = getattr(exception, "response", None)
+    return (
+        response is not None
+        and 400 <= response.status_code < 500
+        and response.status_code != 429
+    )
+
+
+class Command(BaseCommand):
+    help = "Post all queued discord webhook messages, retrying failed ones with exponential backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once there are no more messages to send, instead of waiting for new ones.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Number of messages claimed from the outbox at a time.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Number of webhook urls posted to in parallel.",
+        )
+        parser.add_argument(
+            "--coalesce-window",
+            type=float,
+            default=1,
+            help="Seconds to hold new messages back, so messages created together are posted as one. Ignored with --once, "
+            "so no message is left behind.",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=60,
+            help="Seconds between printing the sent, retried and dropped message counts.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2,
+            help="Seconds to wait before checking for new messages when the outbox is empty.",
+        )
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=7,
+            help="Days to keep sent messages in the outbox before deleting them.",
+        )
+
+    def handle(self, *args, **options):
+        stats_at = time.monotonic() + options["stats_interval"]
+        prune_at = 0
+        # with --once, messages within the window would neither be sent nor waited for
+        coalesce_window = timedelta(
+            seconds=0 if options["once"] else options["coalesce_window"]
+        )
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            while True:
+                if time.monotonic() >= stats_at:
+                    self.stdout.write(webhook_client.metrics_display())
+                    stats_at = time.monotonic() + options["stats_interval"]
+                if time.monotonic() >= prune_at:
+                    self.prune(timedelta(days=options["keep_days"]))
+                    prune_at = time.monotonic() + PRUNE_INTERVAL
+                if self.send_batch(executor, options["batch_size"], coalesce_window):
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        self.stdout.write(webhook_client.metrics_display())
+
+    def prune(self, keep):
+        """
+        Delete sent messages older than keep. Dropped messages are kept, so they can still be looked into and retried.
+        """
+        deleted, _ = WebhookMessage.objects.filter(
+            status=WEBHOOK_SENT, sent_at__lt=timezone.now() - keep
+        ).delete()
+        if deleted:
+            self.stdout.write(f"Deleted {deleted} sent messages.")
+
+    def claim(self, batch_size, coalesce_window):
+        """
+        Claim a batch of due messages, by pushing their next attempt back by CLAIM_TIMEOUT so other workers skip them
+        while they are posted. The claim is committed straight away, so no rows stay locked while posting.
+        Messages are only claimed once they are coalesce_window old, so bursts of messages can be posted together.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            messages = list(
+                WebhookMessage.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status=WEBHOOK_PENDING,
+                    next_attempt_at__lte=now,
+                    created_at__lte=now - coalesce_window,
+                )
+                .order_by("created_at", "pk")[:batch_size]
+            )
+            WebhookMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+                next_attempt_at=now + CLAIM_TIMEOUT
+            )
+        return messages
+
+    def send_batch(self, executor, batch_size, coalesce_window):
+        """
+        Claim and post a batch of due messages, and record the outcome of each.
+        Return the number of messages claimed.
+        """
+        messages = self.claim(batch_size, coalesce_window)
+        if not messages:
+            return 0
+
+        # messages to the same url are posted in order by a single thread, different urls in parallel
+        by_url = [
+            list(url_messages)
+            for _, url_messages in groupby(
+                sorted(messages, key=attrgetter("url")), key=attrgetter("url")
+            )
+        ]
+
+        now = timezone.now()
+        updated = []
+        for url_messages, results in zip(by_url, executor.map(post_messages, by_url)):
+            retry_at = now
+            for message, exception in results:
+                message.attempts += 1
+                if exception is None:
+                    message.status = WEBHOOK_SENT
+                    message.sent_at = now
+                    message.error = ""
+                else:
+                    message.error = str(exception)
+                    if (
+                        is_permanent_failure(exception)
+                        or message.attempts >= MAX_ATTEMPTS
+                    ):
+                        message.status = WEBHOOK_DROPPED
+                        webhook_client.count("dropped")
+                    else:
+                        message.next_attempt_at = retry_at = now + timedelta(
+                            seconds=2**message.attempts
+                        )
+                        webhook_client.count("retried")
+                    self.stderr.write(f"Failed to post {message}: {message.error}")
+                updated.append(message)
+
+            # the messages after a failure were not posted, and wait for the failed message to be retried first, so
+            # the order of each url's messages is kept and a failing url is not posted to again before its backoff
+            posted = {message.pk for message, _ in results}
+            for message in url_messages:
+                if message.pk not in posted:
+                    message.next_attempt_at = retry_at
+                    updated.append(message)
+            if retry_at > now:
+                WebhookMessage.objects.filter(
+                    url=url_messages[0].url,
+                    status=WEBHOOK_PENDING,
+                    next_attempt_at__lt=retry_at,
+                ).exclude(pk__in=[m.pk for m in url_messages]).update(
+                    next_attempt_at=retry_at
+                )
+
+        WebhookMessage.objects.bulk_update(
+            updated, ["status", "attempts", "next_attempt_at", "sent_at", "error"]
+        )
+        return len(messages)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+def forward(apps, schema_data):
+    settings_version_model = apps.get_model("main", "SettingsVersion")
+    settings_version_model.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0109_remove_content_metric_remove_content_metric_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SettingsVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Settings Version",
+                "verbose_name_plural": "Settings Version",
+            },
+        ),
+        migrations.RunPython(forward, reverse_code=migrations.RunPython.noop),
+    ]
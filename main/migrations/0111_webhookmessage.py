@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0110_settingsversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WebhookMessage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(max_length=512)),
+                ("payload", models.JSONField()),
+                (
+                    "status",
+                    models.PositiveIntegerField(
+                        choices=[(0, "Pending"), (1, "Sent"), (2, "Dropped")],
+                        default=0,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                ("error", models.TextField(blank=True)),
+            ],
+            options={
+                "verbose_name": "Webhook Message",
+                "verbose_name_plural": "Webhook Messages",
+                "ordering": ["created_at", "pk"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"],
+                        name="webhook_status_next_attempt",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,14 +1,31 @@
-from django.contrib.postgres.aggregates import StringAgg
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
 from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
 from notifications.models import Notification
 
-from main import DIFFICULTY_CHOICES, EASY, METRIC_CHOICES, TIME
-from um.functions import get_file_path
-
-__all__ = ["Board", "Content", "ContentCategory", "Pet", "UMNotification", "Settings"]
+from main import (
+    DIFFICULTY_CHOICES,
+    EASY,
+    METRIC_CHOICES,
+    TIME,
+    WEBHOOK_PENDING,
+    WEBHOOK_STATUS_CHOICES,
+)
+from um.functions import changed_fields, get_file_path, loaded_values
+
+__all__ = [
+    "Board",
+    "Content",
+    "ContentCategory",
+    "Pet",
+    "UMNotification",
+    "Settings",
+    "SettingsVersion",
+    "WebhookMessage",
+]
 
 
 class Board(models.Model):
@@ -34,11 +51,26 @@ class Board(models.Model):
     class Meta:
         ordering = ["team_size", "name"]
 
+    # fields which change the achievement points earned from this board
+    POINTS_FIELDS = ["points_multiplier", "is_active"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = loaded_values(instance, cls.POINTS_FIELDS)
+        return instance
+
     def __str__(self):
         if self.content.boards.count() > 1:
             return f"{self.content.name} {self.name}"
         return self.name
 
+    def save(self, *args, **kwargs):
+        super(Board, self).save(*args, **kwargs)
+        if changed_fields(self, self.POINTS_FIELDS):
+            self.update_achievement_points()
+        self._loaded_values = loaded_values(self, self.POINTS_FIELDS)
+
     def top_unique_submissions(
         self,
         start_date=None,
@@ -62,29 +94,149 @@ class Board(models.Model):
         if bounty_accepted:
             submissions = submissions.filter(bounty_accepted=bounty_accepted)
 
-        # annotate the teams (accounts values) into a string so we can order by unique teams of accounts and value
-        annotated_submissions = (
-            submissions.accepted()
+        value_ordering = (
+            F("value").desc() if self.content.ordering == "-" else F("value").asc()
+        )
+
+        # number each team's submissions from best to worst, and keep only the best (first) one for each team
+        return (
+            self.submissions.filter(id__in=submissions.accepted().values("id"))
             .annotate(
-                accounts_str=StringAgg(
-                    "accounts__name", delimiter=",", ordering="accounts__name"
+                team_rank=Window(
+                    RowNumber(),
+                    partition_by=F("team_key"),
+                    order_by=[value_ordering, F("date").asc(), F("pk").asc()],
                 )
             )
-            .order_by("accounts_str", f"{self.content.ordering}value")
+            .filter(team_rank=1)
+            .order_by(f"{self.content.ordering}value", "date")
+            .prefetch_related("accounts")
         )
 
-        # grab the first submission for each team (which is the best, since we ordered by value above)
-        submissions = {}
-        for submission in annotated_submissions:
-            if submission.accounts_str not in submissions.keys():
-                submissions[submission.accounts_str] = submission.id
-
+    def ranked_submissions(self):
+        """
+        Return the top submission for each unique team on this board, read from the precomputed standings.
+        Equivalent to top_unique_submissions() with its default arguments.
+        """
         return (
-            self.submissions.filter(id__in=submissions.values())
-            .order_by(f"{self.content.ordering}value", "date")
+            self.submissions.filter(standing__isnull=False)
+            .order_by("standing__rank")
             .prefetch_related("accounts")
         )
 
+    def get_rank(self, submission=None, value=None, team_key=None):
+        """
+        Return the rank of the given submission on this board, read from the precomputed standings.
+        If no submission is given, return the rank a new submission of the given value by the given team would have.
+        Returns None if the submission is not ranked, or if the team already has an equal or better submission.
+        """
+        if submission is not None:
+            return (
+                self.standings.filter(submission=submission)
+                .values_list("rank", flat=True)
+                .first()
+            )
+
+        is_better = "value__gte" if self.content.ordering == "-" else "value__lte"
+        standings = self.standings.all()
+        if team_key:
+            if standings.filter(team_key=team_key, **{is_better: value}).exists():
+                return None
+            standings = standings.exclude(team_key=team_key)
+        # submissions with an equal value rank higher, since they were submitted first
+        return standings.filter(**{is_better: value}).count() + 1
+
+    def update_standings(self):
+        """
+        Recalculate the precomputed standings (achievements.models.BoardStanding) of this board, only writing the
+        standings which changed.
+        """
+        standing_model = self.standings.model
+        with transaction.atomic():
+            # lock this board so concurrent updates of its standings are applied one after another
+            Board.objects.select_for_update().filter(pk=self.pk).first()
+            submissions = (
+                self.top_unique_submissions()
+                .prefetch_related(None)
+                .values_list("pk", "team_key", "value")
+            )
+            new = {
+                pk: (team_key, value, rank)
+                for rank, (pk, team_key, value) in enumerate(submissions, start=1)
+            }
+            existing = {
+                standing.submission_id: standing for standing in self.standings.all()
+            }
+            previous_top_five = sorted(
+                (standing.rank, pk)
+                for pk, standing in existing.items()
+                if standing.rank <= 5
+            )
+
+            removed = [pk for pk in existing if pk not in new]
+            created = [
+                standing_model(
+                    board=self,
+                    submission_id=pk,
+                    team_key=team_key,
+                    value=value,
+                    rank=rank,
+                )
+                for pk, (team_key, value, rank) in new.items()
+                if pk not in existing
+            ]
+            changed = [
+                standing
+                for pk, standing in existing.items()
+                if pk in new
+                and new[pk] != (standing.team_key, standing.value, standing.rank)
+            ]
+            if not (removed or created or changed):
+                return
+
+            previous_accounts = set(
+                self.top_five_accounts().values_list("pk", flat=True)
+            )
+            for standing in changed:
+                standing.team_key, standing.value, standing.rank = new[
+                    standing.submission_id
+                ]
+            # the unique constraints of the standings are deferred, so ranks can be shifted in any order
+            self.standings.filter(submission__in=removed).delete()
+            standing_model.objects.bulk_update(changed, ["team_key", "value", "rank"])
+            standing_model.objects.bulk_create(created)
+
+            # only the top 5 of each board earn achievement points, so they change if the placed submissions or the
+            # accounts of their teams changed
+            top_five = sorted(
+                (rank, pk) for pk, (_, _, rank) in new.items() if rank <= 5
+            )
+            accounts = set(self.top_five_accounts().values_list("pk", flat=True))
+            if previous_top_five != top_five or previous_accounts != accounts:
+                self.update_achievement_points(previous_accounts | accounts)
+
+    def top_five_accounts(self):
+        """
+        Return the accounts which are placed in the top 5 of this board's standings.
+        """
+        from account.models import Account
+
+        return Account.objects.filter(
+            recordsubmission__standing__board=self,
+            recordsubmission__standing__rank__lte=5,
+        ).distinct()
+
+    def update_achievement_points(self, accounts=None):
+        """
+        Recalculate the stored achievement points of the given account primary keys, or of all accounts placed in
+        the top 5 of this board.
+        """
+        from account.models import Account
+
+        if accounts is None:
+            accounts = self.top_five_accounts().values_list("pk", flat=True)
+        Account.objects.filter(pk__in=accounts).update_achievement_points()
+
 
 class Content(models.Model):
     UPLOAD_TO = "board/icons/"
@@ -205,3 +357,66 @@ class Settings(models.Model):
     class Meta:
         verbose_name = "Settings"
         verbose_name_plural = "Settings"
+
+
+class SettingsVersion(models.Model):
+    """
+    Single row counter which is bumped every time a Settings object changes.
+    Lets each process cheaply check if its cached copy of the Settings (see main.config) is out of date.
+    """
+
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Settings Version"
+        verbose_name_plural = "Settings Version"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        if not cls.objects.filter(pk=1).update(version=F("version") + 1):
+            cls.objects.create(pk=1, version=1)
+
+
+class WebhookMessage(models.Model):
+    """
+    Outbox of discord webhook messages.
+    Messages are written in the same transaction as the change they notify about, and posted to discord outside the
+    request by the send_webhooks command, so a slow or failing discord never holds up a request.
+    """
+
+    url = models.URLField(max_length=512)
+    payload = models.JSONField()
+    status = models.PositiveIntegerField(
+        choices=WEBHOOK_STATUS_CHOICES, default=WEBHOOK_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["created_at", "pk"]
+        verbose_name = "Webhook Message"
+        verbose_name_plural = "Webhook Messages"
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"],
+                name="webhook_status_next_attempt",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.url} ({self.get_status_display()})"
+
+    @classmethod
+    def enqueue(cls, url, payload):
+        """
+        Queue payload to be posted to the discord webhook url. Does nothing if no url is configured.
+        """
+        if url:
+            return cls.objects.create(url=url, payload=payload)
@@ -1,13 +1,26 @@
-from django.db.models import Q
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from dragonstone import models, PVM, SKILLING, MAJOR, OTHER, EVENT_MENTOR
-from main import EASY, MEDIUM, HARD, VERY_HARD
+from account.models import Account
+from dragonstone import models
 from main.config import config
-from main.models import Settings
+from main.models import Settings, SettingsVersion
 
-__all__ = ["settings_updated"]
+__all__ = ["settings_updated", "settings_changed"]
+
+PLACE_POINTS_KEYS = [
+    "FIRST_PLACE_PTS",
+    "SECOND_PLACE_PTS",
+    "THIRD_PLACE_PTS",
+    "FOURTH_PLACE_PTS",
+    "FIFTH_PLACE_PTS",
+]
+
+DRAGONSTONE_RANK_KEYS = [
+    "DRAGONSTONE_POINTS_THRESHOLD",
+    "DRAGONSTONE_EXPIRATION_PERIOD",
+    "CAPPED_POINTS_MAX",
+]
 
 
 @receiver(pre_save, sender=Settings)
@@ -16,73 +29,40 @@ def settings_updated(sender, instance, *args, **kwargs):
     Signal for watching if a value of a main.models.Settings object has changed to then make the appropriate
     adjustments in the database.
     """
-    if instance.id and getattr(config, instance.key, None) != instance.value:
-        objects_mapping = {
-            "RECRUITER_PTS": models.RecruitmentPoints.objects.all(),
-            "SOTM_FIRST_PTS": models.SotMPoints.objects.filter(rank=1),
-            "SOTM_SECOND_PTS": models.SotMPoints.objects.filter(rank=2),
-            "SOTM_THIRD_PTS": models.SotMPoints.objects.filter(rank=3),
-            "PVM_SPLIT_EASY_PTS": models.PVMSplitPoints.objects.filter(
-                submission__content__difficulty=EASY
-            ),
-            "PVM_SPLIT_MEDIUM_PTS": models.PVMSplitPoints.objects.filter(
-                submission__content__difficulty=MEDIUM
-            ),
-            "PVM_SPLIT_HARD_PTS": models.PVMSplitPoints.objects.filter(
-                submission__content__difficulty=HARD
-            ),
-            "PVM_SPLIT_VERY_HARD_PTS": models.PVMSplitPoints.objects.filter(
-                submission__content__difficulty=VERY_HARD
-            ),
-            "MENTOR_EASY_PTS": models.MentorPoints.objects.filter(
-                submission__content__difficulty=EASY
-            ),
-            "MENTOR_MEDIUM_PTS": models.MentorPoints.objects.filter(
-                submission__content__difficulty=MEDIUM
-            ),
-            "MENTOR_HARD_PTS": models.MentorPoints.objects.filter(
-                submission__content__difficulty=HARD
-            ),
-            "MENTOR_VERY_HARD_PTS": models.MentorPoints.objects.filter(
-                submission__content__difficulty=VERY_HARD
-            ),
-            "EVENT_MINOR_HOSTS_PTS": models.EventHostPoints.objects.filter(
-                Q(submission__type=PVM) | Q(submission__type=SKILLING)
-            ),
-            "EVENT_MINOR_PARTICIPANTS_PTS": models.EventParticipantPoints.objects.filter(
-                Q(submission__type=PVM) | Q(submission__type=SKILLING)
-            ),
-            "EVENT_MINOR_DONORS_PTS": models.EventDonorPoints.objects.filter(
-                Q(submission__type=PVM) | Q(submission__type=SKILLING)
-            ),
-            "EVENT_MENTOR_HOSTS_PTS": models.EventHostPoints.objects.filter(
-                submission__type=EVENT_MENTOR
-            ),
-            "EVENT_MENTOR_PARTICIPANTS_PTS": models.EventParticipantPoints.objects.filter(
-                submission__type=EVENT_MENTOR
-            ),
-            "EVENT_MENTOR_DONORS_PTS": models.EventDonorPoints.objects.filter(
-                submission__type=EVENT_MENTOR
-            ),
-            "EVENT_MAJOR_HOSTS_PTS": models.EventHostPoints.objects.filter(
-                submission__type=MAJOR
-            ),
-            "EVENT_MAJOR_PARTICIPANTS_PTS": models.EventParticipantPoints.objects.filter(
-                submission__type=MAJOR
-            ),
-            "EVENT_MAJOR_DONORS_PTS": models.EventDonorPoints.objects.filter(
-                submission__type=MAJOR
-            ),
-            "EVENT_OTHER_HOSTS_PTS": models.EventHostPoints.objects.filter(
-                submission__type=OTHER
-            ),
-            "EVENT_OTHER_PARTICIPANTS_PTS": models.EventParticipantPoints.objects.filter(
-                submission__type=OTHER
-            ),
-            "EVENT_OTHER_DONORS_PTS": models.EventDonorPoints.objects.filter(
-                submission__type=OTHER
-            ),
-            "NEW_MEMBER_RAID_PTS": models.NewMemberRaidPoints.objects.all(),
-        }
-        if instance.key in objects_mapping.keys():
-            objects_mapping[instance.key].update(points=instance.value)
+    if not instance.id:
+        return
+
+    # compare against the database rather than the cached config, which may be out of date
+    previous_value = (
+        Settings.objects.filter(id=instance.id).values_list("value", flat=True).first()
+    )
+    if (
+        previous_value != instance.value
+        and instance.key in models.PointsRecalculation.get_points_mapping()
+    ):
+        # recalculating the affected points can take a while, so it is done outside the request by the
+        # process_points_recalculations command
+        models.PointsRecalculation.objects.create(
+            key=instance.key, points=int(instance.value)
+        )
+
+
+@receiver(post_save, sender=Settings)
+@receiver(post_delete, sender=Settings)
+def settings_changed(sender, instance, *args, **kwargs):
+    """
+    Signal for bumping the SettingsVersion counter after a main.models.Settings object is saved or deleted, so every
+    process knows to reload its cached config.
+    """
+    SettingsVersion.bump()
+    config.expire()
+
+    # the recalculations read every key of their group, so wait until they all exist (e.g. on a fresh install)
+    if instance.key in PLACE_POINTS_KEYS and has_settings(PLACE_POINTS_KEYS):
+        Account.objects.update_achievement_points()
+    elif instance.key in DRAGONSTONE_RANK_KEYS and has_settings(DRAGONSTONE_RANK_KEYS):
+        Account.objects.update_dragonstone_expiration()
+
+
+def has_settings(keys):
+    return all(hasattr(config, key) for key in keys)
@@ -0,0 +1,252 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import ThreadingHTTPServer
+from unittest import mock
+
+import requests
+from django.contrib import admin
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from main import WEBHOOK_DROPPED, WEBHOOK_PENDING, WEBHOOK_SENT
+from main.admin import WebhookMessageAdmin
+from main.management.commands.fake_discord_webhooks import (
+    FakeDiscord,
+    get_handler,
+    validate_payload,
+)
+from main.management.commands.send_webhooks import (
+    Command as SendWebhooksCommand,
+    coalesce,
+)
+from main.models import WebhookMessage
+from main.webhooks import WebhookClient, split_embeds
+
+URL = "http://discord.test/api/webhooks/1"
+
+
+class SendWebhooksTests(TestCase):
+    def setUp(self):
+        self.command = SendWebhooksCommand()
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def enqueue(self, content, url=URL):
+        return WebhookMessage.objects.create(
+            url=url,
+            payload={"content": content},
+            created_at=timezone.now() - timedelta(minutes=1),
+        )
+
+    def send_batch(self, side_effect=None, batch_size=50):
+        with mock.patch(
+            "main.management.commands.send_webhooks.webhook_client.send",
+            side_effect=side_effect,
+        ) as send:
+            self.command.send_batch(self.executor, batch_size, timedelta(0))
+        return send
+
+    def test_messages_are_sent(self):
+        messages = [self.enqueue(str(i)) for i in range(3)]
+
+        send = self.send_batch()
+
+        self.assertEqual(
+            [c.args[1]["content"] for c in send.call_args_list], ["0", "1", "2"]
+        )
+        for message in messages:
+            message.refresh_from_db()
+            self.assertEqual(message.status, WEBHOOK_SENT)
+
+    def test_messages_after_a_failure_wait_for_its_retry(self):
+        first, failed, after, later = [self.enqueue(str(i)) for i in range(4)]
+
+        # later is not in the batch
+        self.send_batch([None, requests.ConnectionError("down")], batch_size=3)
+
+        for message in (first, failed, after, later):
+            message.refresh_from_db()
+        self.assertEqual(first.status, WEBHOOK_SENT)
+        self.assertEqual(failed.status, WEBHOOK_PENDING)
+        self.assertEqual(failed.attempts, 1)
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        self.assertEqual(after.status, WEBHOOK_PENDING)
+        self.assertEqual(after.attempts, 0)
+        self.assertEqual(after.next_attempt_at, failed.next_attempt_at)
+        self.assertEqual(later.next_attempt_at, failed.next_attempt_at)
+
+        # nothing is due until the failed message's backoff has passed
+        send = self.send_batch()
+        send.assert_not_called()
+
+    def test_failure_does_not_hold_up_other_urls(self):
+        failed = self.enqueue("0")
+        other = self.enqueue("1", url=f"{URL}0")
+
+        def send(url, payload):
+            if url == URL:
+                raise requests.ConnectionError("down")
+
+        self.send_batch(send)
+
+        failed.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(failed.status, WEBHOOK_PENDING)
+        self.assertEqual(other.status, WEBHOOK_SENT)
+
+    def test_claimed_messages_are_not_claimed_again(self):
+        self.enqueue("0")
+
+        self.assertEqual(len(self.command.claim(50, timedelta(0))), 1)
+        self.assertEqual(self.command.claim(50, timedelta(0)), [])
+
+    def test_old_sent_messages_are_pruned(self):
+        old, recent, pending = [self.enqueue(str(i)) for i in range(3)]
+        WebhookMessage.objects.filter(pk=old.pk).update(
+            status=WEBHOOK_SENT, sent_at=timezone.now() - timedelta(days=8)
+        )
+        WebhookMessage.objects.filter(pk=recent.pk).update(
+            status=WEBHOOK_SENT, sent_at=timezone.now()
+        )
+
+        self.command.prune(timedelta(days=7))
+
+        self.assertQuerySetEqual(
+            WebhookMessage.objects.order_by("pk"), [recent, pending]
+        )
+
+    def test_once_sends_messages_within_the_coalesce_window(self):
+        message = WebhookMessage.objects.create(url=URL, payload={"content": "new"})
+
+        with mock.patch(
+            "main.management.commands.send_webhooks.webhook_client.send"
+        ) as send:
+            call_command("send_webhooks", "--once", "--coalesce-window", "60")
+
+        send.assert_called_once_with(URL, {"content": "new"})
+        message.refresh_from_db()
+        self.assertEqual(message.status, WEBHOOK_SENT)
+
+    def test_embeds_are_coalesced_within_the_embeds_length_limit(self):
+        # quotes are escaped in json, so these embeds only fit together when counting their text
+        messages = [
+            WebhookMessage(url=URL, payload={"embeds": [{"description": '"' * 2900}]})
+            for _ in range(3)
+        ]
+
+        groups = coalesce(messages)
+
+        self.assertEqual([len(group) for _, group in groups], [2, 1])
+        for payload, _ in groups:
+            self.assertIsNone(validate_payload(payload))
+
+
+class WebhookMessageAdminTests(TestCase):
+    def test_retry_requeues_unsent_messages_with_fresh_attempts(self):
+        dropped = WebhookMessage.objects.create(
+            url=URL, payload={}, status=WEBHOOK_DROPPED, attempts=5
+        )
+        sent = WebhookMessage.objects.create(
+            url=URL, payload={}, status=WEBHOOK_SENT, attempts=1
+        )
+
+        WebhookMessageAdmin(WebhookMessage, admin.site).retry(
+            None, WebhookMessage.objects.all()
+        )
+
+        dropped.refresh_from_db()
+        sent.refresh_from_db()
+        self.assertEqual((dropped.status, dropped.attempts), (WEBHOOK_PENDING, 0))
+        self.assertEqual((sent.status, sent.attempts), (WEBHOOK_SENT, 1))
+
+
+class ValidatePayloadTests(SimpleTestCase):
+    def embed(self, description="description", title="title"):
+        return {"title": title, "description": description}
+
+    def test_valid_payloads(self):
+        self.assertIsNone(validate_payload({"content": "hello"}))
+        self.assertIsNone(validate_payload({"embeds": [self.embed()] * 10}))
+        self.assertIsNone(
+            validate_payload({"embeds": [self.embed("x" * 4096, title="")]})
+        )
+
+    def test_invalid_payloads(self):
+        for payload in [
+            None,
+            [],
+            {},
+            {"content": ""},
+            {"embeds": [self.embed()] * 11},
+            {"embeds": [self.embed("x" * 4097, title="")]},
+            {"embeds": [self.embed("x" * 3000)] * 2},
+            {"content": "hello", "components": [{}] * 6},
+        ]:
+            with self.subTest(payload=payload):
+                self.assertIsNotNone(validate_payload(payload))
+
+    def test_split_embeds_fit_in_messages(self):
+        embeds = [self.embed("x" * 4000)] * 3 + [self.embed()] * 25
+
+        messages = split_embeds(embeds)
+
+        self.assertEqual(sum(len(message) for message in messages), 28)
+        for message in messages:
+            self.assertIsNone(validate_payload({"embeds": message}))
+
+
+class WebhookClientTests(SimpleTestCase):
+    """
+    Tests of the webhook client against the fake discord webhook server.
+    """
+
+    RATE_LIMIT = 2
+    RATE_WINDOW = 0.5
+
+    def setUp(self):
+        self.discord = FakeDiscord(self.RATE_LIMIT, self.RATE_WINDOW)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), get_handler(self.discord, 0, 0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.route = "/api/webhooks/1"
+        self.url = f"http://127.0.0.1:{server.server_port}{self.route}"
+
+    def test_requests_are_paced_within_the_rate_limit(self):
+        client = WebhookClient()
+        start = time.monotonic()
+
+        for i in range(5):
+            client.send(self.url, {"content": str(i)})
+
+        stats = self.discord.stats[self.route]
+        self.assertEqual(stats["posted"], 5)
+        self.assertEqual(stats["rate_limited"], 0)
+        # 5 requests at 2 per window need at least 2 windows
+        self.assertGreaterEqual(time.monotonic() - start, 2 * self.RATE_WINDOW * 0.9)
+        self.assertEqual(client.metrics["sent"], 5)
+
+    def test_rate_limited_requests_are_retried(self):
+        # another process used up the rate limit, which this client doesn't know about
+        for i in range(self.RATE_LIMIT):
+            WebhookClient().send(self.url, {"content": str(i)})
+        client = WebhookClient()
+
+        client.send(self.url, {"content": "limited"})
+
+        stats = self.discord.stats[self.route]
+        self.assertEqual(stats["posted"], self.RATE_LIMIT + 1)
+        self.assertEqual(stats["rate_limited"], 1)
+        self.assertEqual(client.metrics["retried"], 1)
+
+    def test_rejected_payloads_raise(self):
+        client = WebhookClient()
+
+        with self.assertRaises(requests.HTTPError) as e:
+            client.send(self.url, {"embeds": []})
+
+        self.assertEqual(e.exception.response.status_code, 400)
+        self.assertEqual(self.discord.stats[self.route]["invalid"], 1)
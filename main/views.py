@@ -21,7 +21,7 @@ class LeaderboardView(TemplateView):
         per_page = 5
 
         context["content"] = get_object_or_404(
-            models.Content.objects.prefetch_related("boards__submissions"),
+            models.Content.objects.prefetch_related("boards"),
             slug=self.kwargs.get("content_name"),
         )
 
@@ -42,7 +42,7 @@ class LeaderboardView(TemplateView):
 
             context["boards"] = context["content"].boards.all()
 
-            submissions = context["active_board"].top_unique_submissions()
+            submissions = context["active_board"].ranked_submissions()
 
             pb_page = Paginator(submissions, per_page)
             try:
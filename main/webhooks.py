@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+__all__ = ["webhook_client", "embeds_length", "split_embeds"]
+
+# discord's limits on a webhook message
+MAX_EMBEDS = 10
+MAX_EMBEDS_LENGTH = 6000  # total characters of all embeds
+MAX_DESCRIPTION_LENGTH = 4096  # characters of an embed description
+
+
+def embeds_length(embeds):
+    """
+    Return the number of characters of embeds which count towards discord's MAX_EMBEDS_LENGTH limit.
+    """
+    return sum(
+        len(embed.get("title", ""))
+        + len(embed.get("description", ""))
+        + len(embed.get("footer", {}).get("text", ""))
+        + len(embed.get("author", {}).get("name", ""))
+        + sum(
+            len(field.get("name", "")) + len(str(field.get("value", "")))
+            for field in embed.get("fields", [])
+        )
+        for embed in embeds
+    )
+
+
+def split_embeds(embeds):
+    """
+    Split embeds, in order, into as few lists as possible which each fit in a single discord message.
+    """
+    messages = []
+    for embed in embeds:
+        if (
+            messages
+            and len(messages[-1]) < MAX_EMBEDS
+            and embeds_length(messages[-1] + [embed]) <= MAX_EMBEDS_LENGTH
+        ):
+            messages[-1].append(embed)
+        else:
+            messages.append([embed])
+    return messages
+
+
+class RateLimitBucket:
+    """
+    Discord rate limit state of a single webhook url, as last reported by the X-RateLimit-* response headers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.remaining = None
+        self.reset_at = 0
+
+    def update(self, headers):
+        if "X-RateLimit-Remaining" in headers:
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+        if "X-RateLimit-Reset-After" in headers:
+            self.reset_at = time.monotonic() + float(headers["X-RateLimit-Reset-After"])
+
+    def block(self, seconds):
+        self.remaining = 0
+        self.reset_at = time.monotonic() + seconds
+
+    def delay(self):
+        """
+        Return the seconds to wait before the next request to this bucket's url is allowed.
+        """
+        if self.remaining == 0:
+            return max(self.reset_at - time.monotonic(), 0)
+        return 0
+
+
+class WebhookClient:
+    """
+    Shared client for posting to discord webhooks.
+
+    Keeps a pooled HTTP session, and tracks discord's rate limits per webhook url from the X-RateLimit-* and
+    Retry-After headers. Requests to a url are paced to stay within its limit, and requests that are rate limited
+    anyway are retried after the time discord asks for. Counts of sent, retried and dropped messages are kept in
+    metrics.
+    """
+
+    MAX_RETRIES = 3
+    TIMEOUT = 10  # in seconds
+
+    def __init__(self, pool_size=10):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.metrics = Counter()
+        self._buckets = defaultdict(RateLimitBucket)
+        self._lock = threading.Lock()
+        self._global_reset_at = 0
+
+    def send(self, url, payload):
+        """
+        Post payload to the webhook url, waiting out any rate limits.
+        Raises requests.RequestException if the message could not be posted.
+        """
+        with self._lock:
+            bucket = self._buckets[url]
+
+        # requests to the same url are sent one at a time, so each sees the rate limit left by the previous one
+        with bucket.lock:
+            for attempt in range(self.MAX_RETRIES + 1):
+                time.sleep(
+                    max(bucket.delay(), self._global_reset_at - time.monotonic(), 0)
+                )
+                response = self.session.post(url, json=payload, timeout=self.TIMEOUT)
+                bucket.update(response.headers)
+                if response.status_code != 429:
+                    response.raise_for_status()
+                    self.count("sent")
+                    return response
+
+                retry_after = float(response.headers.get("Retry-After", 1))
+                if response.headers.get("X-RateLimit-Global"):
+                    self._global_reset_at = time.monotonic() + retry_after
+                else:
+                    bucket.block(retry_after)
+                if attempt < self.MAX_RETRIES:
+                    self.count("retried")
+            response.raise_for_status()
+
+    def count(self, metric):
+        with self._lock:
+            self.metrics[metric] += 1
+
+    def metrics_display(self):
+        with self._lock:
+            return ", ".join(
+                f"{metric}: {self.metrics[metric]}"
+                for metric in ["sent", "retried", "dropped"]
+            )
+
+
+webhook_client = WebhookClient()
@@ -5,3 +5,30 @@ import uuid
 def get_file_path(instance, filename):
     ext = filename.split(".")[-1]
     return os.path.join(instance.UPLOAD_TO, f"{uuid.uuid4()}.{ext}")
+
+
+def loaded_values(instance, fields):
+    """
+    Return the values of the given fields of a model instance, to later tell if they changed with changed_fields().
+    Models take this snapshot in from_db() and after each save. Deferred fields are skipped rather than loaded.
+    """
+    return {
+        name: instance.__dict__[name] for name in fields if name in instance.__dict__
+    }
+
+
+def changed_fields(instance, fields):
+    """
+    Return which of the given fields of a model instance changed since its snapshot (instance._loaded_values) was
+    taken. Deferred fields count as changed once they are set. Nothing has changed on an instance which wasn't loaded
+    from the database or saved yet.
+    """
+    loaded = getattr(instance, "_loaded_values", None)
+    if loaded is None:
+        return set()
+    return {
+        name
+        for name in fields
+        if name in instance.__dict__
+        and (name not in loaded or instance.__dict__[name] != loaded[name])
+    }